@@ -49,9 +49,11 @@ class AcousticFlow2D(acs.Acoustic2D):
     def apply_flow(self):
         """Apply flow field to the field components."""
 
+        shifted_rows = self.step % self.flow_t_deltas == 0
+        if not np.any(shifted_rows):
+            return
+
         for component in [self.pressure, self.velocity_x, self.velocity_y]:
-            for n, f in enumerate(self.flow_t_deltas):
-                if self.step % f == 0:
-                    component.values[n * self.x.samples + 1: (n + 1) * self.x.samples] = \
-                        component.values[n * self.x.samples: (n + 1) * self.x.samples - 1]
-                    component.values[n * self.x.samples: n * self.x.samples + 1] = 0
+            values = component.values2d
+            values[shifted_rows, 1:] = values[shifted_rows, :-1]
+            values[shifted_rows, 0] = 0
@@ -29,12 +29,13 @@ class Acoustic1D(fld.Field1D):
 
         self.a_p_v = self.d_x(factors=(self.t.increment / self.x.increment
                                        * self.material_vector('sound_velocity') ** 2
-                                       * self.material_vector('density')))
+                                       * self.material_vector('density')), format='csr')
         self.a_v_p = self.d_x(factors=(self.t.increment / self.x.increment
-                                       / self.material_vector('density')), variant='backward')
+                                       / self.material_vector('density')),
+                              variant='backward', format='csr')
         self.a_v_v = self.d_x2(factors=(self.t.increment / self.x.increment ** 2
                                         * self.material_vector('absorption_coef')
-                                        / self.material_vector('density')))
+                                        / self.material_vector('density')), format='csr')
         self.matrices_assembled = True
 
     def sim_step(self):
@@ -91,20 +92,22 @@ class Acoustic2D(fld.Field2D):
 
         self.a_p_vx = self.d_x(factors=(self.t.increment / self.x.increment
                                         * self.material_vector('sound_velocity') ** 2
-                                        * self.material_vector('density')))
+                                        * self.material_vector('density')), format='csr')
         self.a_p_vy = self.d_y(factors=(self.t.increment / self.y.increment
                                         * self.material_vector('sound_velocity') ** 2
-                                        * self.material_vector('density')))
+                                        * self.material_vector('density')), format='csr')
         self.a_vx_p = self.d_x(factors=(self.t.increment / self.x.increment
-                                        / self.material_vector('density')), variant='backward')
+                                        / self.material_vector('density')),
+                               variant='backward', format='csr')
         self.a_vy_p = self.d_y(factors=(self.t.increment / self.y.increment
-                                        / self.material_vector('density')), variant='backward')
-        self.a_vx_vx = (self.d_x2(factors=(self.t.increment / self.x.increment ** 2
-                                           * self.material_vector('absorption_coef')
-                                           / self.material_vector('density')))
-                        + self.d_y2(factors=(self.t.increment / self.y.increment ** 2
-                                             * self.material_vector('absorption_coef')
-                                             / self.material_vector('density')))).todia()
+                                        / self.material_vector('density')),
+                               variant='backward', format='csr')
+        self.a_vx_vx = self.laplacian(factors_x=(self.t.increment / self.x.increment ** 2
+                                                 * self.material_vector('absorption_coef')
+                                                 / self.material_vector('density')),
+                                      factors_y=(self.t.increment / self.y.increment ** 2
+                                                 * self.material_vector('absorption_coef')
+                                                 / self.material_vector('density')))
         self.a_vy_vy = self.a_vx_vx
         self.matrices_assembled = True
 
@@ -181,24 +184,26 @@ class Acoustic3DAxi(fld.Field2D):
         self.a_p_vx = self.d_x(factors=(self.t.increment / self.x.increment
                                         * self.material_vector('sound_velocity') ** 2
                                         * self.material_vector('density')
-                                        / self._radii()))
+                                        / self._radii()), format='csr')
         self.a_p_vy = self.d_y(factors=(self.t.increment / self.y.increment
                                         * self.material_vector('sound_velocity') ** 2
-                                        * self.material_vector('density')))
+                                        * self.material_vector('density')), format='csr')
         self.a_vx_p = self.d_x(factors=(self.t.increment / self.x.increment
-                                        / self.material_vector('density')), variant='backward')
+                                        / self.material_vector('density')),
+                               variant='backward', format='csr')
         self.a_vy_p = self.d_y(factors=(self.t.increment / self.y.increment
-                                        / self.material_vector('density')), variant='backward')
-        self.a_vx_vx = (self.d_x2(factors=(self.t.increment / self.x.increment ** 2
-                                           * self.material_vector('absorption_coef')
-                                           / self.material_vector('density')))
-                        + self.d_y2(factors=(self.t.increment / self.y.increment ** 2
-                                             * self.material_vector('absorption_coef')
-                                             / self.material_vector('density')))
+                                        / self.material_vector('density')),
+                               variant='backward', format='csr')
+        self.a_vx_vx = (self.laplacian(factors_x=(self.t.increment / self.x.increment ** 2
+                                                  * self.material_vector('absorption_coef')
+                                                  / self.material_vector('density')),
+                                       factors_y=(self.t.increment / self.y.increment ** 2
+                                                  * self.material_vector('absorption_coef')
+                                                  / self.material_vector('density')))
                         + self.d_x(factors=(self.t.increment / self.x.increment
                                             * self.material_vector('absorption_coef')
                                             / self.material_vector('density') / self._radii()),
-                                   variant='central')).todia()
+                                   variant='central')).tocsr()
         self.a_vy_vy = self.a_vx_vx
         self.matrices_assembled = True
 
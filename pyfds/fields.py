@@ -1,19 +1,168 @@
+import functools as ft
 import logging as lo
 import numpy as np
 import scipy.sparse as sp
+import scipy.sparse.linalg as sl
 from . import regions as reg
 
 logger = lo.getLogger('pyfds')
 
 
+class _VersionedList(list):
+    """List counting its modifications, so caches depending on its items can detect changes
+    without comparing the items."""
+
+    # a class attribute, as unpickling appends the items before the attributes are restored
+    version = 0
+
+
+def _counting(method):
+    """Wraps a modifying list method, so it increments the version of the list."""
+
+    @ft.wraps(method)
+    def modify(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    return modify
+
+
+for _name in ['append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__']:
+    setattr(_VersionedList, _name, _counting(getattr(list, _name)))
+
+
+class _StencilMatrix:
+    """Attribute of fields returning the sparse matrix of a difference quotient with the factors
+    of a stencil kernel. As the simulation only uses the kernels, the matrix is built when the
+    attribute is first accessed after the matrices have been assembled (None before)."""
+
+    def __init__(self, derivative, factors, scale=1, **kwargs):
+        """Class constructor.
+
+        Args:
+            derivative: Name of the method creating the matrix (e.g. 'd_x' or 'd_y2').
+            factors: Name of the attribute with the factors of the stencil.
+            scale: Factor of the matrix relative to the factors of the stencil.
+            kwargs: Further arguments of the method creating the matrix (e.g. variant).
+        """
+
+        self.derivative = derivative
+        self.factors = factors
+        self.scale = scale
+        self.kwargs = kwargs
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, field, owner=None):
+        if field is None:
+            return self
+        factors = getattr(field, self.factors)
+        if factors is None:
+            return None
+        matrix = getattr(field, self.derivative)(factors=self.scale * factors, format='csr',
+                                                 **self.kwargs)
+        # the instance attribute takes precedence over the descriptor until it is discarded
+        field.__dict__[self.name] = matrix
+        return matrix
+
+
 class Field:
     """Base class for all fields."""
 
+    # maximum number of difference quotient matrices cached per field
+    max_cached_operators = 32
+    # attributes created by assemble_matrices that are not pickled, as compiled stencil kernels
+    # cannot be pickled and buffers do not have to be transferred
+    _transient_attributes = ()
+
     def __init__(self):
         self.material_regions = []
         self.step = 0
         self.matrices_assembled = False
         self.t = None
+        self._operators = {}
+        self._diagonals = None
+        self._dtype = np.dtype(float)
+
+    def __setattr__(self, name, value):
+        # components assigned to a field take its shape, so they can be viewed in it (see
+        # FieldComponent.values2d) without every field passing the shape to its components
+        if isinstance(value, FieldComponent):
+            shape = getattr(self, 'shape', None)
+            if shape is not None and value.values.size == np.prod(shape):
+                value.shape = shape
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        """Excludes the cached operators, material vectors, stencil kernels and buffers when
+        pickling the field (e.g. to pass it to another process), as they are rebuilt when needed.
+        Without its kernels, the field assembles its matrices again on the next simulation."""
+
+        state = self.__dict__.copy()
+        if '_operators' in state:
+            state['_operators'] = {}
+            state['_diagonals'] = None
+            state['_material_vectors'] = {}
+        for name in self._transient_attributes:
+            if state.get(name) is not None:
+                state[name] = None
+                state['matrices_assembled'] = False
+        return state
+
+    @property
+    def dtype(self):
+        """Floating point type of the matrices, material vectors and field components (float64 by
+        default). Single precision halves the memory traffic of the simulation steps, but rounding
+        errors accumulate faster, which may matter for long simulations or high absorption.
+        Setting the type converts the field components and requires assembling the matrices
+        again."""
+
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, dtype):
+        self._dtype = np.dtype(dtype)
+        # components are instance attributes, so class attributes (e.g. properties building
+        # matrices) are not evaluated
+        for component in vars(self).values():
+            if isinstance(component, FieldComponent):
+                component.values = component.values.astype(self._dtype)
+        self.reset_matrices()
+
+    def reset_matrices(self):
+        """Discards the assembled matrices and cached operators, so the matrices are assembled
+        again when the simulation is started (e.g. after materials have been changed)."""
+
+        self._operators.clear()
+        self._diagonals = None
+        self._material_vectors.clear()
+        self._discard_stencil_matrices()
+        self.matrices_assembled = False
+
+    def _discard_stencil_matrices(self):
+        """Discards the matrices built from the factors of the stencils (see _StencilMatrix), so
+        they are built again from the current factors when accessed."""
+
+        for name in list(vars(self)):
+            if isinstance(getattr(type(self), name, None), _StencilMatrix):
+                del self.__dict__[name]
+
+    @property
+    def material_regions(self):
+        """List of the material regions of the field. Material vectors are cached until the list,
+        the indices of its regions or their material parameters change. Call reset_matrices
+        after modifying indices in place."""
+
+        return self._material_regions
+
+    @material_regions.setter
+    def material_regions(self, material_regions):
+        self._material_regions = _VersionedList(material_regions)
+        # the version of a new list may equal the one of the replaced list
+        self._material_vectors = {}
 
     @property
     def num_points(self):
@@ -40,22 +189,226 @@ class Field:
 
         Returns:
             Vector which contains the specified material parameter for each point in the field.
+            The vector is cached (see material_regions), so it is read-only.
         """
 
-        param_found = False
-        mat_vector = np.zeros(self.num_points)
+        key = (self.dtype, self.material_regions.version,
+               tuple((mat_reg.version, mat_reg.region.version,
+                      tuple(getattr(mat, mat_parameter, None) for mat in mat_reg.materials))
+                     for mat_reg in self.material_regions))
+        cached = self._material_vectors.get(mat_parameter)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        mat_vector = self._build_material_vector(mat_parameter)
+        mat_vector.flags.writeable = False
+        self._material_vectors[mat_parameter] = (key, mat_vector)
+        return mat_vector
+
+    def _build_material_vector(self, mat_parameter):
+        """Builds the vector of a material parameter for material_vector.
+
+        Args:
+            mat_parameter: Material parameter of interest.
 
+        Returns:
+            Vector which contains the specified material parameter for each point in the field.
+        """
+
+        background = None
+        index_arrays = []
+        values = []
         for mat_reg in self.material_regions:
             for mat in mat_reg.materials:
-                if hasattr(mat, mat_parameter):
-                    mat_vector[mat_reg.region.indices] = getattr(mat, mat_parameter)
-                    param_found = True
-
-        if not param_found:
-            raise KeyError('Material parameter {} not found in set materials.')
+                value = getattr(mat, mat_parameter, None)
+                if value is None:
+                    continue
+                if mat_reg is self.material_regions[0] and \
+                        len(mat_reg.region.indices) == self.num_points:
+                    # the main region created with the field covers all points
+                    background = value
+                elif values and value == values[-1]:
+                    # consecutive regions with the same value can be scattered together
+                    index_arrays[-1] = np.concatenate([index_arrays[-1],
+                                                       mat_reg.region.index_array])
+                else:
+                    index_arrays.append(mat_reg.region.index_array)
+                    values.append(value)
+
+        if background is None and not values:
+            raise KeyError('Material parameter {} not found in set materials.'
+                           .format(mat_parameter))
+
+        mat_vector = np.full(self.num_points, 0 if background is None else background,
+                             dtype=self.dtype)
+        if not values:
+            return mat_vector
+
+        # find the last region setting each point, as later regions overwrite earlier ones
+        owners = np.full(self.num_points, -1, dtype=np.intp)
+        sources = np.repeat(np.arange(len(values)), [len(indices) for indices in index_arrays])
+        np.maximum.at(owners, np.concatenate(index_arrays), sources)
+
+        covered = owners >= 0
+        mat_vector[covered] = np.asarray(values, dtype=self.dtype)[owners[covered]]
 
         return mat_vector
 
+    def _stencil_operator(self, coefficients, offsets, factors=None, format='dia'):
+        """Returns a sparse matrix for a difference quotient given by the coefficients and offsets
+        of its diagonals multiplied by factors given for every point. Matrices without factors,
+        with scalar factors or with read-only factor arrays (e.g. material vectors) are cached,
+        the least recently used matrix is dropped if the cache is full. Each call returns a copy
+        of a cached matrix, so its data can be modified (e.g. scaled in place).
+
+        Args:
+            coefficients: Coefficient of each diagonal.
+            offsets: Offset of each diagonal.
+            factors: Factor for each point to be applied after derivation.
+            format: Sparse format of the returned matrix ('dia' or 'csr').
+
+        Returns:
+            Sparse matrix the calculate the difference quotient.
+        """
+
+        if format not in ('dia', 'csr'):
+            raise ValueError('Unknown sparse format {}.'.format(format))
+
+        if factors is None:
+            factors_key = None
+        elif np.ndim(factors) == 0:
+            factors_key = float(factors)
+        elif isinstance(factors, np.ndarray) and not factors.flags.writeable \
+                and factors.base is None:
+            # the factors cannot change, so their identity is a key that is cheap to compare
+            factors_key = id(factors)
+        else:
+            return self._build_matrix(coefficients, offsets,
+                                      np.asarray(factors, dtype=self.dtype), format)
+        key = (tuple(coefficients), tuple(offsets), factors_key, format)
+
+        if key in self._operators:
+            # move the entry to the end, so the first entry is the least recently used one
+            entry = self._operators.pop(key)
+        else:
+            if len(self._operators) >= Field.max_cached_operators:
+                del self._operators[next(iter(self._operators))]
+            # the factors are kept with the matrix, so their id is not reused while cached
+            entry = (self._build_matrix(coefficients, offsets, factors, format), factors)
+        self._operators[key] = entry
+        return entry[0].copy()
+
+    def _build_matrix(self, coefficients, offsets, factors, format):
+        """Builds the sparse matrix for _stencil_operator in the given format.
+
+        Args:
+            coefficients: Coefficient of each diagonal.
+            offsets: Offset of each diagonal.
+            factors: Factor for each point to be applied after derivation.
+            format: Sparse format of the returned matrix ('dia' or 'csr').
+
+        Returns:
+            Sparse matrix the calculate the difference quotient.
+        """
+
+        if format == 'csr':
+            # convert once here, so matrix vector products in the simulation loop use CSR,
+            # the DIA matrix is temporary then, so its diagonals can be reused
+            return self._build_stencil_operator(coefficients, offsets, factors,
+                                                self._diagonal_buffer(len(coefficients))).tocsr()
+        return self._build_stencil_operator(coefficients, offsets, factors)
+
+    def _build_stencil_operator(self, coefficients, offsets, factors, data=None):
+        """Builds the sparse matrix for _stencil_operator.
+
+        Args:
+            coefficients: Coefficient of each diagonal.
+            offsets: Offset of each diagonal.
+            factors: Factor for each point to be applied after derivation.
+            data: Buffer for the diagonals, which is referenced by the returned matrix (a new
+                array by default).
+
+        Returns:
+            Sparse matrix the calculate the difference quotient.
+        """
+
+        shape = (self.num_points, self.num_points)
+        offsets = np.asarray(offsets, dtype=np.intc)
+
+        if data is None:
+            data = np.empty((len(coefficients), self.num_points), dtype=self.dtype)
+        if factors is None:
+            # the diagonals are contiguous, so matrix vector products do not copy them
+            data[...] = np.asarray(coefficients, dtype=self.dtype)[:, np.newaxis]
+        else:
+            # fill the diagonals in place to avoid temporary arrays for each diagonal
+            for row, coefficient in zip(data, coefficients):
+                np.multiply(factors, coefficient, out=row)
+        return sp.dia_matrix((data, offsets), shape=shape)
+
+    def _diagonal_buffer(self, num_diagonals):
+        """Returns a buffer for the diagonals of temporary DIA matrices, which is reused between
+        calls.
+
+        Args:
+            num_diagonals: Number of diagonals.
+
+        Returns:
+            Array of shape (num_diagonals, num_points).
+        """
+
+        if self._diagonals is None or len(self._diagonals) < num_diagonals \
+                or self._diagonals.shape[1] != self.num_points:
+            self._diagonals = np.empty((num_diagonals, self.num_points), dtype=self.dtype)
+        return self._diagonals[:num_diagonals]
+
+    def _stencil_op(self, coefficients, offsets, factors=None):
+        """Returns a linear operator for a difference quotient that computes its product on
+        slices of the given values.
+
+        Args:
+            coefficients: Coefficient of each diagonal.
+            offsets: Offset of each diagonal.
+            factors: Factor for each point to be applied after derivation.
+
+        Returns:
+            Linear operator the calculate the difference quotient.
+        """
+
+        scaled = np.empty(self.num_points, dtype=self.dtype)
+        stencil = _compile_stencil(coefficients, offsets, self.num_points, self.dtype)
+
+        def matvec(values):
+            values = np.ravel(values)
+            if factors is not None:
+                values = np.multiply(factors, values, out=scaled)
+            return stencil(values, np.empty(self.num_points, dtype=self.dtype))
+
+        return sl.LinearOperator((self.num_points, self.num_points), matvec=matvec,
+                                 dtype=self.dtype)
+
+    def _stencil_kernel(self, coefficients, offsets):
+        """Returns a function that computes the product of a difference quotient multiplied by
+        factors given for every point and writes it to a given array (see compile_stencil).
+
+        Args:
+            coefficients: Coefficient of each diagonal.
+            offsets: Offset of each diagonal.
+
+        Returns:
+            Function apply(factors, values, out) returning out, factors may be None.
+        """
+
+        stencil = _compile_stencil(coefficients, offsets, self.num_points, self.dtype)
+        scaled = np.empty(self.num_points, dtype=self.dtype)
+
+        def apply(factors, values, out):
+            if factors is not None:
+                values = np.multiply(factors, values, out=scaled)
+            return stencil(values, out)
+
+        return apply
+
     def assemble_matrices(self):
         """Assemble the matrices and vectors required for simulation."""
         raise NotImplementedError
@@ -84,13 +437,20 @@ class Field:
 
         logger.info('Starting simulation of {} steps.'.format(num_steps))
 
-        start_step = self.step
-        while self.step < start_step + num_steps:
+        # the outputs reserve memory for all steps, so their signals do not have to grow
+        for component in vars(self).values():
+            if isinstance(component, FieldComponent):
+                for output in component.outputs:
+                    output.reserve(num_steps)
 
+        # the step is counted in a local variable, sim_step reads it from the attribute
+        end_step = self.step + num_steps
+        for step in range(self.step, end_step):
+            self.step = step
             self.sim_step()
             if progress_logger:
-                progress_logger.log(self.step)
-            self.step += 1
+                progress_logger.log(step)
+        self.step = end_step
 
         logger.info('Simulation of {} steps completed.'.format(num_steps))
 
@@ -116,14 +476,15 @@ class Field:
 
         new_material_region = reg.MaterialRegion(*args, **kwargs)
         self.material_regions.append(new_material_region)
+        self.matrices_assembled = False
         logger.info('Material region {} added.'.format(new_material_region.region.name))
 
     def reset(self):
         """Reset the field to all-zero but keep all boundaries to enable repeated simulation using
         the same field object."""
-        for name in dir(self):
-            if isinstance(getattr(self, name), FieldComponent):
-                getattr(self, name).values = np.zeros_like(getattr(self, name).values)
+        for component in vars(self).values():
+            if isinstance(component, FieldComponent):
+                component.values = np.zeros_like(component.values)
         self.step = 0
 
 
@@ -155,51 +516,81 @@ class Field1D(Field):
 
         return self.x.samples
 
-    def d_x(self, factors=None, variant='forward'):
+    @property
+    def shape(self):
+        """Returns the shape of the field as (x samples,)."""
+
+        return self.x.samples,
+
+    def d_x(self, factors=None, variant='forward', format='dia'):
         """Creates a sparse matrix for computing the first derivative with respect to x multiplied
         by factors given for every point. Uses forward difference quotient by default.
 
         Args:
             factors: Factor for each point to be applied after derivation.
             variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+            format: Sparse format of the returned matrix ('dia' or 'csr').
 
         Returns:
             Sparse matrix the calculate derivatives of field components.
         """
 
-        # use ones as factors if none are specified
-        if factors is None:
-            factors = np.array(1).repeat(self.num_points)
-
-        if variant == 'forward':
-            return sp.dia_matrix((np.array([-factors, factors]), [0, 1]),
-                                 shape=(self.num_points, self.num_points))
-        elif variant == 'central':
-            return sp.dia_matrix((np.array([-factors / 2, factors / 2]), [-1, 1]),
-                                 shape=(self.num_points, self.num_points))
-        elif variant == 'backward':
-            return sp.dia_matrix((np.array([-factors, factors]), [-1, 0]),
-                                 shape=(self.num_points, self.num_points))
-        else:
-            raise ValueError('Unknown difference quotient variant {}.'.format(variant))
+        coefficients, offsets = _first_derivative_stencil(variant, 1)
+
+        return self._stencil_operator(coefficients, offsets, factors, format)
+
+    def d_x_op(self, factors=None, variant='forward'):
+        """Creates a linear operator for computing the first derivative with respect to x
+        multiplied by factors given for every point. Equivalent to d_x, but the product is
+        computed on slices of the field component instead of using a sparse matrix.
+
+        Args:
+            factors: Factor for each point to be applied after derivation.
+            variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+
+        Returns:
+            Linear operator the calculate derivatives of field components.
+        """
+
+        return self._stencil_op(*_first_derivative_stencil(variant, 1), factors=factors)
 
-    def d_x2(self, factors=None):
+    def d_x2(self, factors=None, format='dia'):
         """Creates a sparse matrix for computing the second derivative with respect to x multiplied
         by factors given for every point. Uses central difference quotient.
 
         Args:
             factors: Factor for each point to be applied after derivation.
+            format: Sparse format of the returned matrix ('dia' or 'csr').
 
         Returns:
             Sparse matrix the calculate second derivatives of field components.
         """
 
-        # use ones as factors if none are specified
-        if factors is None:
-            factors = np.array(1).repeat(self.num_points)
+        return self._stencil_operator((1, -2, 1), (-1, 0, 1), factors, format)
+
+    def compile_stencil(self, variant='forward', order=1):
+        """Creates a function computing the first or second derivative with respect to x
+        multiplied by factors given for every point, equivalent to the product with d_x or d_x2.
+        The function is specialized for the number of points of the field and writes the result
+        to a given array, so the simulation loop does not allocate memory.
+
+        Args:
+            variant: Variant for the difference quotient of the first derivative ('forward',
+                'central', or 'backward').
+            order: Order of the derivative (1 or 2, the second derivative is always central).
 
-        return sp.dia_matrix((np.array([factors, -2 * factors, factors]), [-1, 0, 1]),
-                             shape=(self.num_points, self.num_points))
+        Returns:
+            Function apply(factors, values, out) returning out, factors may be None.
+        """
+
+        if order == 1:
+            coefficients, offsets = _first_derivative_stencil(variant, 1)
+        elif order == 2:
+            coefficients, offsets = (1, -2, 1), (-1, 0, 1)
+        else:
+            raise ValueError('Unsupported order of derivative {}.'.format(order))
+
+        return self._stencil_kernel(coefficients, offsets)
 
     def get_index(self, position):
         """Returns the index of a point at the given position.
@@ -236,8 +627,8 @@ class Field1D(Field):
             Line region.
         """
 
-        return reg.LineRegion([index for index in range(self.get_index(position[0]),
-                                                        self.get_index(position[1]) + 1)],
+        return reg.LineRegion(np.arange(self.get_index(position[0]),
+                                        self.get_index(position[1]) + 1, dtype=np.intp),
                               position, name=name)
 
 
@@ -270,110 +661,212 @@ class Field2D(Field):
     def num_points(self):
         return self.x.samples * self.y.samples
 
-    def d_x(self, factors=None, variant='forward'):
+    @property
+    def shape(self):
+        """Returns the shape of the field as (y samples, x samples), which matches the order of
+        the points in field components (x is the fastest changing index)."""
+
+        return self.y.samples, self.x.samples
+
+    def d_x(self, factors=None, variant='forward', format='dia'):
         """Creates a sparse matrix for computing the first derivative with respect to x multiplied
         by factors given for every point. Uses forward difference quotient by default.
 
         Args:
             factors: Factor for each point to be applied after derivation.
             variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+            format: Sparse format of the returned matrix ('dia' or 'csr').
 
         Returns:
             Sparse matrix the calculate derivatives of field components.
         """
 
-        # use ones as factors if none are specified
-        if factors is None:
-            factors = np.array(1).repeat(self.num_points)
-
-        if variant == 'forward':
-            return sp.dia_matrix((np.array([-factors, factors]), [0, 1]),
-                                 shape=(self.num_points, self.num_points))
-        elif variant == 'central':
-            return sp.dia_matrix((np.array([-factors / 2, factors / 2]), [-1, 1]),
-                                 shape=(self.num_points, self.num_points))
-        elif variant == 'backward':
-            return sp.dia_matrix((np.array([-factors, factors]), [-1, 0]),
-                                 shape=(self.num_points, self.num_points))
-        else:
-            raise ValueError('Unknown difference quotient variant {}.'.format(variant))
+        coefficients, offsets = _first_derivative_stencil(variant, 1)
+
+        return self._stencil_operator(coefficients, offsets, factors, format)
 
-    def d_y(self, factors=None, variant='forward'):
+    def d_y(self, factors=None, variant='forward', format='dia'):
         """Creates a sparse matrix for computing the first derivative with respect to y multiplied
         by factors given for every point. Uses forward difference quotient by default.
 
         Args:
             factors: Factor for each point to be applied after derivation.
             variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+            format: Sparse format of the returned matrix ('dia' or 'csr').
 
         Returns:
             Sparse matrix the calculate derivatives of field components.
         """
 
-        # use ones as factors if none are specified
-        if factors is None:
-            factors = np.array(1).repeat(self.num_points)
-
-        if variant == 'forward':
-            return sp.dia_matrix((np.array([-factors, factors]), [0, self.x.samples]),
-                                 shape=(self.num_points, self.num_points))
-        elif variant == 'central':
-            return sp.dia_matrix(
-                (np.array([-factors / 2, factors / 2]), [-self.x.samples, self.x.samples]),
-                shape=(self.num_points, self.num_points))
-        elif variant == 'backward':
-            return sp.dia_matrix((np.array([-factors, factors]), [-self.x.samples, 0]),
-                                 shape=(self.num_points, self.num_points))
-        else:
-            raise ValueError('Unknown difference quotient variant {}.'.format(variant))
+        coefficients, offsets = _first_derivative_stencil(variant, self.x.samples)
+
+        return self._stencil_operator(coefficients, offsets, factors, format)
+
+    def d_x_op(self, factors=None, variant='forward'):
+        """Creates a linear operator for computing the first derivative with respect to x
+        multiplied by factors given for every point. Equivalent to d_x, but the product is
+        computed on slices of the field component instead of using a sparse matrix.
+
+        Args:
+            factors: Factor for each point to be applied after derivation.
+            variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+
+        Returns:
+            Linear operator the calculate derivatives of field components.
+        """
 
-    def d_x2(self, factors=None):
+        return self._stencil_op(*_first_derivative_stencil(variant, 1), factors=factors)
+
+    def d_x2(self, factors=None, format='dia'):
         """Creates a sparse matrix for computing the second derivative with respect to x multiplied
         by factors given for every point. Uses central difference quotient.
 
         Args:
             factors: Factor for each point to be applied after derivation.
+            format: Sparse format of the returned matrix ('dia' or 'csr').
 
         Returns:
             Sparse matrix the calculate second derivatives of field components.
         """
 
-        # use ones as factors if none are specified
-        if factors is None:
-            factors = np.array(1).repeat(self.num_points)
+        return self._stencil_operator((1, -2, 1), (-1, 0, 1), factors, format)
+
+    def d_y_op(self, factors=None, variant='forward'):
+        """Creates a linear operator for computing the first derivative with respect to y
+        multiplied by factors given for every point. Equivalent to d_y, but the product is
+        computed on slices of the field component instead of using a sparse matrix.
 
-        return sp.dia_matrix((np.array([factors, -2 * factors, factors]), [-1, 0, 1]),
-                             shape=(self.num_points, self.num_points))
+        Args:
+            factors: Factor for each point to be applied after derivation.
+            variant: Variant for the difference quotient ('forward', 'central', or 'backward').
 
-    def d_y2(self, factors=None):
+        Returns:
+            Linear operator the calculate derivatives of field components.
+        """
+
+        return self._stencil_op(*_first_derivative_stencil(variant, self.x.samples),
+                                factors=factors)
+
+    def d_y2(self, factors=None, format='dia'):
         """Creates a sparse matrix for computing the second derivative with respect to y multiplied
         by factors given for every point. Uses central difference quotient.
 
         Args:
             factors: Factor for each point to be applied after derivation.
+            format: Sparse format of the returned matrix ('dia' or 'csr').
 
         Returns:
             Sparse matrix the calculate second derivatives of field components.
         """
 
-        # use ones as factors if none are specified
-        if factors is None:
-            factors = np.array(1).repeat(self.num_points)
+        return self._stencil_operator((1, -2, 1), (-self.x.samples, 0, self.x.samples), factors,
+                                      format)
+
+    def compile_stencil(self, variant='forward', order=1, direction='x'):
+        """Creates a function computing the first or second derivative with respect to x or y
+        multiplied by factors given for every point, equivalent to the product with d_x, d_x2,
+        d_y or d_y2. The function is specialized for the number of points of the field and writes
+        the result to a given array, so the simulation loop does not allocate memory.
 
-        return sp.dia_matrix((np.array([factors, -2 * factors, factors]),
-                              [-self.x.samples, 0, self.x.samples]),
-                             shape=(self.num_points, self.num_points))
+        Args:
+            variant: Variant for the difference quotient of the first derivative ('forward',
+                'central', or 'backward').
+            order: Order of the derivative (1 or 2, the second derivative is always central).
+            direction: Direction of the derivative ('x' or 'y').
+
+        Returns:
+            Function apply(factors, values, out) returning out, factors may be None.
+        """
+
+        if direction == 'x':
+            stride = 1
+        elif direction == 'y':
+            stride = self.x.samples
+        else:
+            raise ValueError('Unknown direction {}.'.format(direction))
+
+        if order == 1:
+            coefficients, offsets = _first_derivative_stencil(variant, stride)
+        elif order == 2:
+            coefficients, offsets = (1, -2, 1), (-stride, 0, stride)
+        else:
+            raise ValueError('Unsupported order of derivative {}.'.format(order))
+
+        return self._stencil_kernel(coefficients, offsets)
+
+    def gradient(self, factors_x=None, factors_y=None, variant='forward'):
+        """Creates a sparse matrix for computing the first derivatives with respect to x and y
+        multiplied by factors given for every point. Equivalent to stacking d_x(factors_x) on top
+        of d_y(factors_y), so both derivatives are computed with a single product that reads
+        the field component only once. The first num_points values of the product are the
+        derivatives with respect to x, the others with respect to y.
+
+        Args:
+            factors_x: Factor for each point to be applied after derivation with respect to x.
+            factors_y: Factor for each point to be applied after derivation with respect to y
+                (factors_x by default).
+            variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+
+        Returns:
+            Sparse matrix of shape (2 * num_points, num_points) in CSR format.
+        """
+
+        if factors_y is None:
+            factors_y = factors_x
+
+        return sp.vstack([self.d_x(factors_x, variant, format='csr'),
+                          self.d_y(factors_y, variant, format='csr')], format='csr')
+
+    def laplacian(self, factors_x=None, factors_y=None):
+        """Creates a sparse matrix for computing the sum of the second derivatives with respect to
+        x and y multiplied by factors given for every point. Equivalent to d_x2(factors_x) +
+        d_y2(factors_y), but assembled as a single five-diagonal operator in CSR format. As for
+        d_x2 and d_y2, no special treatment is applied at the edges of the field.
+
+        Args:
+            factors_x: Factor for each point to be applied after derivation with respect to x.
+            factors_y: Factor for each point to be applied after derivation with respect to y
+                (factors_x by default).
+
+        Returns:
+            Sparse matrix the calculate the Laplacian of field components.
+        """
+
+        # use ones as factors if none are specified
+        if factors_x is None:
+            factors_x = np.ones(self.num_points, dtype=self.dtype)
+        if factors_y is None:
+            factors_y = factors_x
+
+        # offsets of the x and y stencils coincide for a single sample in x direction
+        if self.x.samples == 1:
+            return (self.d_x2(factors_x) + self.d_y2(factors_y)).tocsr()
+
+        # the DIA matrix is only temporary, so the diagonal buffer can be reused
+        data = self._diagonal_buffer(5)
+        data[0] = data[4] = factors_y
+        data[1] = data[3] = factors_x
+        np.add(factors_x, factors_y, out=data[2])
+        data[2] *= -2
+        return sp.dia_matrix((data, np.array([-self.x.samples, -1, 0, 1, self.x.samples],
+                                             dtype=np.intc)),
+                             shape=(self.num_points, self.num_points)).tocsr()
 
     def get_index(self, position):
         """Returns the index of a point at the given position.
 
         Args:
-            position: Position of the requested point.
+            position: Position of the requested point as (x coordinate, y coordinate) or array of
+                positions with shape (N, 2).
 
         Returns:
-            Index of the point.
+            Index of the point or array of indices.
         """
 
+        if np.ndim(position) == 2:
+            x_values, y_values = np.asarray(position).T
+            return self.x.get_indices(x_values) + self.y.get_indices(y_values) * self.x.samples
+
         return self.x.get_index(position[0]) + self.y.get_index(position[1]) * self.x.samples
 
     def get_position(self, index):
@@ -386,7 +879,21 @@ class Field2D(Field):
             Position of the point as (x coordinate, y coordinate).
         """
 
-        return self.x.vector[index % self.x.samples], self.y.vector[int(index / self.x.samples)]
+        y_index, x_index = divmod(int(index), self.x.samples)
+        return self.x.vector[x_index], self.y.vector[y_index]
+
+    def _positions(self, indices):
+        """Returns the positions of the points with the given indices (see get_position).
+
+        Args:
+            indices: Integer array of point indices.
+
+        Returns:
+            Arrays of the x coordinates and y coordinates of the points.
+        """
+
+        y_indices, x_indices = np.divmod(indices, self.x.samples)
+        return self.x.vector[x_indices], self.y.vector[y_indices]
 
     def get_line_region(self, position, name=''):
         """Creates a line region at the given position (start_x, start_y, end_x, end_y),
@@ -403,42 +910,48 @@ class Field2D(Field):
         start_idx = self.get_index(position[:2])
         end_idx = self.get_index(position[2:])
 
-        x_diff = start_idx % self.x.samples - end_idx % self.x.samples
-        y_diff = int(start_idx / self.x.samples) - int(end_idx / self.x.samples)
-
-        num_points = max(np.abs([x_diff, y_diff]))
-        point_indices = []
+        start_y, start_x = divmod(start_idx, self.x.samples)
+        end_y, end_x = divmod(end_idx, self.x.samples)
 
-        for ii in range(num_points + 1):
+        num_points = max(abs(end_x - start_x), abs(end_y - start_y))
+        steps = np.arange(num_points + 1, dtype=np.intp)
 
-            x_position = start_idx % self.x.samples - np.round(ii / num_points * x_diff)
-            y_position = int(start_idx / self.x.samples) - np.round(ii / num_points * y_diff)
-            point_indices.append(int(x_position + self.x.samples * y_position))
+        x_positions = start_x + _round_ratio(steps * (end_x - start_x), num_points)
+        y_positions = start_y + _round_ratio(steps * (end_y - start_y), num_points)
+        point_indices = x_positions + self.x.samples * y_positions
 
         return reg.LineRegion(point_indices, position, name=name)
 
-    def get_rect_region(self, position, name=''):
+    def get_rect_region(self, position, name='', row_major=False):
         """Creates a rectangular region at the given position (origin_x, origin_y, size_x, size_y),
         inclusive, origin is the lower left corner.
 
         Args:
             position: Position of the rectangular region (origin_x, origin_y, size_x, size_y).
             name: Name of the region.
+            row_major: Order the indices row by row, so each row of the rectangle is contiguous
+                in memory, and let outputs read the region as a block of the field instead of
+                gathering the values point by point (column by column by default).
 
         Returns:
             Rectangular region.
         """
 
-        x_start = self.x.get_index(position[0])
-        y_start = self.y.get_index(position[1])
-        x_end = self.x.get_index(position[0] + position[2])
-        y_end = self.y.get_index(position[1] + position[3])
+        x_start, x_end = np.sort(self.x.get_indices([position[0], position[0] + position[2]]))
+        y_start, y_end = np.sort(self.y.get_indices([position[1], position[1] + position[3]]))
 
-        x_start, x_end = min(x_start, x_end), max(x_start, x_end)
-        y_start, y_end = min(y_start, y_end), max(y_start, y_end)
+        x_indices = np.arange(x_start, x_end + 1, dtype=np.intp)
+        y_indices = self.x.samples * np.arange(y_start, y_end + 1, dtype=np.intp)
 
-        return reg.RectRegion([x + y * self.x.samples for x in range(x_start, x_end + 1)
-                               for y in range(y_start, y_end + 1)], position, name)
+        if row_major:
+            indices = (y_indices[:, np.newaxis] + x_indices).ravel()
+            block = (slice(y_start, y_end + 1), slice(x_start, x_end + 1))
+            return reg.RectRegion(indices, position, name, block=block)
+
+        # indices are ordered column by column (y varies fastest)
+        indices = (x_indices[:, np.newaxis] + y_indices).ravel()
+
+        return reg.RectRegion(indices, position, name)
 
     def get_tri_region(self, position, name=''):
         """Creates a triangular region at the given position (point0_x, point0_y, point1_x,
@@ -493,13 +1006,12 @@ class Field2D(Field):
                          self.get_index(position[2:4]),
                          self.get_index(position[4:]))
 
-        inside_indices = []
-        for ii in range(min(point_indices), max(point_indices) + 1):
-            point = self.get_position(ii)
-            if edge_01(point) >= 0 and edge_12(point) >= 0 and edge_20(point) >= 0:
-                inside_indices.append(ii)
+        # the edge functions are evaluated for all candidate points at once
+        candidates = np.arange(min(point_indices), max(point_indices) + 1, dtype=np.intp)
+        points = self._positions(candidates)
+        inside = (edge_01(points) >= 0) & (edge_12(points) >= 0) & (edge_20(points) >= 0)
 
-        return reg.TriRegion(inside_indices, position, name)
+        return reg.TriRegion(candidates[inside], position, name)
 
     def get_ellipse_region(self, centre, radii, name=''):
         """Create an elliptic region with the given parameters.
@@ -525,10 +1037,8 @@ class Field2D(Field):
         min_point_index = self.get_index((centre[0], centre[1] - radii[1]))
         max_point_index = self.get_index((centre[0], centre[1] + radii[1]))
 
-        inside_indices = []
-        for ii in range(min_point_index, max_point_index):
-            if inside(self.get_position(ii)):
-                inside_indices.append(ii)
+        candidates = np.arange(min_point_index, max_point_index, dtype=np.intp)
+        inside_indices = candidates[inside(self._positions(candidates))]
 
         return reg.EllipseRegion(inside_indices, centre, radii, name)
 
@@ -547,12 +1057,18 @@ class Dimension:
         self.samples = int(samples)
         self.increment = increment
         self.snap_radius = np.finfo(float).eps * 10
+        self._vector = None
 
     @property
     def vector(self):
-        """Returns the axis as a vector."""
+        """Returns the axis as a read-only vector, which is cached as long as samples and
+        increment are unchanged."""
 
-        return np.arange(start=0, stop=self.samples) * self.increment
+        if self._vector is None or self._vector[0] != (self.samples, self.increment):
+            vector = np.arange(start=0, stop=self.samples) * self.increment
+            vector.flags.writeable = False
+            self._vector = ((self.samples, self.increment), vector)
+        return self._vector[1]
 
     def get_index(self, value):
         """Returns the index of a given value.
@@ -564,30 +1080,72 @@ class Dimension:
             Index.
         """
 
-        index, = np.where(np.abs(self.vector - value) <= self.snap_radius)
-        assert len(index) < 2, "Multiple points found within snap radius of given value."
-        assert len(index) > 0, "No point found within snap radius of given value."
+        # the axis is uniform, so only the nearest sample can be within the snap radius
+        index = int(round(value / self.increment))
+        assert 0 <= index < self.samples and \
+            abs(index * self.increment - value) <= self.snap_radius, \
+            "No point found within snap radius of given value."
 
-        return int(index)
+        return index
+
+    def get_indices(self, values):
+        """Returns the indices of the given values.
+
+        Args:
+            values: Array of values the indices are requested for.
+
+        Returns:
+            Array of indices.
+        """
+
+        values = np.asarray(values)
+        indices = np.rint(values / self.increment).astype(np.intp)
+        assert np.all((indices >= 0) & (indices < self.samples)
+                      & (np.abs(indices * self.increment - values) <= self.snap_radius)), \
+            "No point found within snap radius of given value."
+
+        return indices
 
 
 class FieldComponent:
     """A single component of a field (e.g. electric field in the x direction)."""
 
-    def __init__(self, num_points):
+    def __init__(self, num_points, shape=None):
         """Class constructor.
 
         Args:
             num_points: Number of points in the field component.
+            shape: Shape of the field the component belongs to ((num_points,) by default, set
+                when the component is assigned to a field).
         """
 
         # values of the field component
         self.values = np.zeros(num_points)
+        self.shape = shape if shape else (num_points,)
         # list with objects of type Boundary
         self.boundaries = []
         # list with objects of type Output
         self.outputs = []
 
+    @property
+    def boundaries(self):
+        """List with objects of type Boundary. The plan applying them is cached until the list,
+        the boundaries or the indices of their regions change (see _boundary_plan)."""
+
+        return self._boundaries
+
+    @boundaries.setter
+    def boundaries(self, boundaries):
+        self._boundaries = _VersionedList(boundaries)
+        self._bound_plan = None
+
+    @property
+    def values2d(self):
+        """Returns the values as a view with the shape of the field, e.g. (y samples, x samples)
+        for two-dimensional fields, so rows are contiguous in memory."""
+
+        return self.values.reshape(self.shape)
+
     def apply_bounds(self, step):
         """Applies the boundary conditions to the field component.
 
@@ -595,20 +1153,76 @@ class FieldComponent:
             step: Simulation step, required if boundary is a signal that changes over time.
         """
 
-        for bound in self.boundaries:
-            self.values[bound.region.indices] = bound.apply(self.values[bound.region.indices],
-                                                            step=step)
+        if not self.boundaries:
+            return
+
+        plan = self._boundary_plan()
+        if plan is None:
+            # boundaries overlap, so they have to be applied one after another
+            for bound in self.boundaries:
+                indices = bound.region.index_array
+                self.values[indices] = bound.apply(self.values[indices], step=step)
+            return
+
+        indices, additive, step_values, signal_segments = plan
+        for bound, segment in signal_segments:
+            step_values[segment] = bound.step_value(step)
+        self.values[indices] = additive * self.values[indices] + step_values
+
+    def _boundary_plan(self):
+        """Returns the concatenated indices of all boundaries with their additive flags, a buffer
+        for the values of a step and the slices of the boundaries with signals in it, so disjoint
+        boundaries can be applied with a single gather and scatter. Scalar values are written to
+        the buffer once. The plan is cached as long as the boundaries, their indices, values and
+        additive flags are unchanged.
+
+        Returns:
+            Tuple of indices, additive flags, value buffer and pairs of boundaries with signals
+            and their slices, or None if boundaries overlap.
+        """
+
+        key = (self.boundaries.version,
+               tuple((bound.version, bound.region.version) for bound in self.boundaries))
+        if self._bound_plan is not None and self._bound_plan[0] == key:
+            return self._bound_plan[1]
+
+        index_arrays = [bound.region.index_array for bound in self.boundaries]
+        indices = np.concatenate(index_arrays)
+
+        if np.unique(indices).size < indices.size:
+            plan = None
+        else:
+            additive = np.concatenate([np.full(len(index_array), float(bound.additive))
+                                       for bound, index_array
+                                       in zip(self.boundaries, index_arrays)])
+            bounds = np.cumsum([0] + [len(index_array) for index_array in index_arrays])
+            step_values = np.empty(indices.size)
+            signal_segments = []
+            for bound, start, stop in zip(self.boundaries, bounds[:-1], bounds[1:]):
+                if np.ndim(bound.value) == 0:
+                    step_values[start:stop] = bound.value
+                else:
+                    signal_segments.append((bound, slice(start, stop)))
+            plan = (indices, additive, step_values, signal_segments)
+
+        self._bound_plan = (key, plan)
+        return plan
 
     def write_outputs(self):
         """Writes the values of the field component to the outputs."""
 
         for output in self.outputs:
 
-            if not output.signals:
-                output.signals = [[self.values[index]] for index in output.region.indices]
+            if getattr(output.region, 'block', None) is not None and len(self.shape) == 2:
+                # row major rectangular regions are a block of the field
+                values, indices = self.values2d[output.region.block].ravel(), None
             else:
-                [signal.append(self.values[index]) for index, signal in
-                 zip(output.region.indices, output.signals)]
+                values, indices = self.values, output.region.index_array
+
+            if output.stream:
+                output.write_stream(values, indices)
+            else:
+                output.record(values, indices)
 
     def add_boundary(self, *args, **kwargs):
         """Adds a boundary to the field component.
@@ -633,6 +1247,113 @@ class FieldComponent:
         logger.info('Output region {} added.'.format(new_output.region.name))
 
 
+def _round_ratio(numerators, denominator):
+    """Rounds the ratios of integers to the nearest integer (halves to even) using integer
+    arithmetic only, so exact halves are not affected by floating point errors.
+
+    Args:
+        numerators: Array of integer numerators.
+        denominator: Positive integer denominator (zero is treated as one).
+
+    Returns:
+        Array of the rounded ratios.
+    """
+
+    denominator = max(denominator, 1)
+    quotients, remainders = np.divmod(numerators, denominator)
+    round_up = (2 * remainders > denominator) | ((2 * remainders == denominator)
+                                                  & (quotients % 2 == 1))
+    return quotients + round_up
+
+
+def _first_derivative_stencil(variant, stride):
+    """Returns the coefficients and offsets of the diagonals of a difference quotient for the
+    first derivative.
+
+    Args:
+        variant: Variant for the difference quotient ('forward', 'central', or 'backward').
+        stride: Distance between neighbouring points in direction of the derivative.
+
+    Returns:
+        coefficients: Coefficient of each diagonal.
+        offsets: Offset of each diagonal.
+    """
+
+    if variant == 'forward':
+        return (-1, 1), (0, stride)
+    elif variant == 'central':
+        return (-0.5, 0.5), (-stride, stride)
+    elif variant == 'backward':
+        return (-1, 1), (-stride, 0)
+    else:
+        raise ValueError('Unknown difference quotient variant {}.'.format(variant))
+
+
+def _compile_stencil(coefficients, offsets, num_points, dtype=float):
+    """Returns a function that computes the product of a difference quotient given by its
+    diagonals and the values using slices instead of a sparse matrix. The function is
+    specialized for the number of points: the slices are computed once and a main diagonal
+    initializes the result, so it does not have to be zeroed before. Off-diagonals with
+    coefficients other than 1 or -1 are scaled in a scratch buffer instead of a temporary array.
+    First order differences of neighbouring points (forward or backward) are computed by a single
+    subtraction.
+
+    Args:
+        coefficients: Coefficient of each diagonal.
+        offsets: Offset of each diagonal.
+        num_points: Number of points the difference quotient is applied to.
+        dtype: Data type of the values (float by default).
+
+    Returns:
+        Function apply(values, out) writing the result of the product to out and returning it.
+    """
+
+    terms = []
+    for coefficient, offset in zip(coefficients, offsets):
+        if offset >= 0:
+            terms.append((coefficient, slice(0, num_points - offset), slice(offset, None)))
+        else:
+            terms.append((coefficient, slice(-offset, None), slice(0, num_points + offset)))
+    # the main diagonal covers all points, so it is applied first
+    terms.sort(key=lambda term: term[1] != slice(0, num_points))
+    initialize = terms[0][1] == slice(0, num_points)
+    scratch = np.empty(num_points, dtype=dtype) if any(
+        abs(term[0]) != 1 for term in terms[initialize:]) else None
+
+    if (initialize and len(terms) == 2 and abs(terms[0][0]) == 1
+            and terms[1][0] == -terms[0][0]):
+        sign, target, source = terms[0][0], terms[1][1], terms[1][2]
+        # points not covered by the off-diagonal only have the main diagonal
+        rest = slice(target.stop, None) if target.start == 0 else slice(0, target.start)
+
+        def difference(values, out):
+            if sign == 1:
+                np.subtract(values[target], values[source], out=out[target])
+            else:
+                np.subtract(values[source], values[target], out=out[target])
+            np.multiply(values[rest], sign, out=out[rest])
+            return out
+
+        return difference
+
+    def apply(values, out):
+        if initialize:
+            np.multiply(values, terms[0][0], out=out)
+        else:
+            out.fill(0)
+        for coefficient, target, source in terms[initialize:]:
+            if coefficient == 1:
+                out[target] += values[source]
+            elif coefficient == -1:
+                out[target] -= values[source]
+            else:
+                scaled = scratch[target]
+                out[target] += np.multiply(values[source], coefficient, out=scaled)
+        return out
+
+    return apply
+
+
 class ProgressLogger:
     """Class to easily log progress in percentage without double messages and at a specified
     increment."""
@@ -661,8 +1382,7 @@ class ProgressLogger:
             current_step: Current step of the simulation.
         """
 
-        if int(current_step / self.num_steps * 100 % self.log_increment) == 0 and \
-                self._last_message_at is not int(current_step / self.num_steps * 100):
-            self.logger.info('Simulating. {} % completed.'
-                             .format(int(current_step / self.num_steps * 100)))
-            self._last_message_at = int(current_step / self.num_steps * 100)
+        percentage = current_step / self.num_steps * 100
+        if int(percentage % self.log_increment) == 0 and self._last_message_at != int(percentage):
+            self.logger.info('Simulating. {} % completed.'.format(int(percentage)))
+            self._last_message_at = int(percentage)
@@ -1,8 +1,15 @@
+import math
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.collections as mc
+from matplotlib.figure import Figure
 import matplotlib.patches as pa
 import matplotlib.pyplot as pp
 import multiprocessing as mp
 import numpy as np
 import os
+import queue as qu
+import subprocess
+import threading
 from . import fields as fld
 from . import regions as reg
 
@@ -29,8 +36,10 @@ class Animator:
         """
 
         self.field = field
-        self.field_components = {name: getattr(self.field, name) for name in dir(self.field)
-                                 if isinstance(getattr(self.field, name), fld.FieldComponent)}
+        # instance attributes only, so properties of the field are not evaluated (sorted by name
+        # like dir, as the first component is observed by default)
+        self.field_components = {name: value for name, value in sorted(vars(self.field).items())
+                                 if isinstance(value, fld.FieldComponent)}
         if observed_component:
             if observed_component in self.field_components.keys():
                 self.observed_component = observed_component
@@ -39,6 +48,7 @@ class Animator:
                                .format(observed_component))
         else:
             self.observed_component = list(self.field_components.keys())[0]
+        self._component_names = tuple(self.field_components.keys())
 
         self.steps_per_frame = int(steps_per_frame)
         if isinstance(scale, (list, tuple, np.ndarray)) and \
@@ -51,39 +61,154 @@ class Animator:
         self.frame_delay = frame_delay
         self.save_video = save_video
         self.video_file_name = video_file_name
-        self.image_files = []
         self.ffmpeg_path = 'ffmpeg'
         self.video_fps = 30
         self.video_dpi = 100
+        # type of the frames passed to the plot, single precision is sufficient for display
+        self.frame_dtype = np.float32
 
         self.show_boundaries = True
         self.show_materials = True
         self.show_output = True
 
-        self._plot_queue = mp.Queue()
-        self._x_axis_prefix, self._x_axis_factor = get_prefix(max(self.field.x.vector))
-        self._t_prefix, self._t_factor = get_prefix(max(self.field.t.vector))
+        # run the simulation in a thread instead of a process, which avoids copying the field
+        # but only runs in parallel to the plot while numpy releases the GIL
+        self.use_threads = False
+
+        self._x_axis_prefix, self._x_axis_factor = get_prefix(self.field.x.vector[-1])
+        self._t_prefix, self._t_factor = get_prefix(self.field.t.vector[-1])
+        # x axis in the unit of the plot, computed once for all frames
+        self._x_vector = self.field.x.vector / self._x_axis_factor
+        self._x_max = self.field.x.vector[-1] / self._x_axis_factor
 
         self.axes = None
         self.plot_title = ''
         self.x_label = '$x$'
         self.time_precision = 2
 
-    def _sim_function(self, queue):
-        """Simulation function to be started as a separate process.
+        self._video_process = None
+        self._video_declined = False
+        self._video_axes = None
+        self._video_update = None
+        self._blit = False
+
+    def _animate_simulation(self, main_plot, update_plot):
+        """Runs the simulation in a separate process (or thread if use_threads is set) and updates
+        the animation with its results.
+        The values of the observed component are passed through shared memory, so only the time
+        and the slot of each frame are sent through the queue. If the canvas supports blitting,
+        only the main plot and the title are redrawn for each frame.
 
         Args:
-            queue: Instance of multiprocessing.Queue that is used to transfer data between
-                simulation and visualization process.
+            main_plot: Artist showing the observed component.
+            update_plot: Function updating the plot with given values of the observed component.
         """
 
-        for ii in range(int(self.field.t.samples / self.steps_per_frame)):
-            self.field.simulate(self.steps_per_frame)
-            queue.put((self.field.t.vector[self.field.step - 1],
-                       getattr(self.field, self.observed_component).values))
+        component = getattr(self.field, self.observed_component)
+        if self.use_threads:
+            plot_queue = qu.Queue()
+            frames = np.empty(2 * component.values.size, dtype=self.frame_dtype)
+            free_slots = threading.Semaphore(2)
+        else:
+            # forked processes inherit the field instead of receiving a pickled copy
+            context = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else None)
+            plot_queue = context.Queue()
+            frames = context.RawArray(np.ctypeslib.as_ctypes_type(self.frame_dtype),
+                                      2 * component.values.size)
+            free_slots = context.Semaphore(2)
+        frame_shape = self._frame_shape()
+        frame_slots = np.frombuffer(frames, dtype=self.frame_dtype).reshape((2,) + frame_shape)
+        # buffer in the shape of the plot, so two-dimensional plots need no reshaping per frame
+        data = np.empty(frame_shape, dtype=self.frame_dtype)
+        # title with only the time left to be formatted per frame
+        title_format = '{title} $t$ = {{:.{prec}f}} {prefix}s'.format(
+            title=self.plot_title.replace('{', '{{').replace('}', '}}'),
+            prec=self.time_precision, prefix=self._t_prefix)
+
+        canvas = self.axes.figure.canvas
+        animated_artists = (main_plot, self.axes.title)
+        self._blit = canvas.supports_blit
+        if self._blit:
+            # animated artists are skipped by full redraws, which store the background instead
+            background = []
+
+            def store_background(event):
+                background[:] = [canvas.copy_from_bbox(self.axes.figure.bbox)]
+
+            for artist in animated_artists:
+                artist.set_animated(True)
+            draw_connection = canvas.mpl_connect('draw_event', store_background)
+            pp.show(block=False)
+            canvas.draw()
+
+        sim_args = (self.field, self.observed_component, self.steps_per_frame, self.save_video,
+                    plot_queue, frames, self.frame_dtype, frame_shape, free_slots)
+        if self.use_threads:
+            sim_worker = threading.Thread(target=_simulate_frames, args=sim_args)
+        else:
+            sim_worker = context.Process(target=_simulate_frames, args=sim_args)
+        sim_worker.start()
+
+        finished = False
+        while not finished:
+            # wait for new simulation result, but keep the plot window responsive
+            try:
+                message = plot_queue.get(timeout=max(self.frame_delay, 1e-2))
+            except qu.Empty:
+                canvas.flush_events()
+                continue
+
+            # show only the newest frame if the plot fell behind
+            messages = [message]
+            while not self.save_video and not isinstance(messages[-1], fld.Field):
+                try:
+                    messages.append(plot_queue.get_nowait())
+                except qu.Empty:
+                    break
+            frame_messages = [message for message in messages
+                              if not isinstance(message, fld.Field)]
+            for _ in frame_messages[:-1]:
+                free_slots.release()
+
+            if frame_messages:
+                time, slot = frame_messages[-1]
+                np.copyto(data, frame_slots[slot])
+                free_slots.release()
+                self.axes.title.set_text(title_format.format(time / self._t_factor))
+                update_plot(data)
+                if self._blit:
+                    canvas.restore_region(background[0])
+                    for artist in animated_artists:
+                        self.axes.draw_artist(artist)
+                    canvas.blit(self.axes.figure.bbox)
+                    canvas.start_event_loop(self.frame_delay)
+                else:
+                    pp.pause(self.frame_delay)
+                if self.save_video:
+                    self._save_frame(data)
+
+            # simulation function returns field object when simulation terminates to get output
+            if isinstance(messages[-1], fld.Field):
+                # update main process field components with simulation result
+                self._update_components(messages[-1])
+                finished = True
+
+        sim_worker.join()
+        if self._blit:
+            canvas.mpl_disconnect(draw_connection)
+            for artist in animated_artists:
+                artist.set_animated(False)
+        if self.save_video:
+            self._create_video()
+
+    def _frame_shape(self):
+        """Returns the shape of the frames of the observed component passed to the plot.
+
+        Returns:
+            Shape of the frames.
+        """
 
-        # return field when simulation finishes to get output signals
-        queue.put(self.field)
+        return (self.field.num_points,)
 
     def _update_components(self, message):
         """Function to be called when simulation process finished to update the field components
@@ -93,37 +218,131 @@ class Animator:
             message: Field object returned by the simulation process.
         """
 
-        for name in dir(self.field):
-            if isinstance(getattr(self.field, name), fld.FieldComponent):
-                setattr(self.field, name, getattr(message, name))
+        for name in self._component_names:
+            setattr(self.field, name, getattr(message, name))
 
-    def _save_frame(self):
-        """Save current frame of animation to a png file for video creation."""
+    def _region_shapes(self, region):
+        """Returns the shapes representing a region in the plot, computed by the function
+        registered for the type of the region in _shape_functions.
 
-        file_name = 'frame{0:06d}.png'.format(len(self.image_files))
-        pp.savefig(file_name, dpi=self.video_dpi)
-        self.image_files.append(file_name)
+        Args:
+            region: Region to be plotted.
 
-    def _create_video(self):
-        """Create video file from saved png files."""
+        Returns:
+            kind: Kind of the shapes, which are collected in one artist per kind.
+            shapes: List of shapes.
+        """
+
+        shape_function = self._shape_functions.get(type(region))
+        if shape_function is None:
+            # subclasses of the region types
+            for region_type, function in self._shape_functions.items():
+                if isinstance(region, region_type):
+                    shape_function = function
+                    break
+            else:
+                raise TypeError('Unknown type in region list: {}'.format(type(region)))
+        return shape_function(region)
+
+    def _shown_regions(self):
+        """Returns the regions shown in the setup (materials, boundaries and outputs, depending on
+        the show_* attributes).
+
+        Returns:
+            List of regions.
+        """
+
+        regions = []
+        if self.show_materials:
+            regions += [mat_region.region for mat_region in self.field.material_regions]
+        if self.show_boundaries:
+            regions += [boundary.region for component in self.field_components.values()
+                        for boundary in component.boundaries]
+        if self.show_output:
+            regions += [output.region for component in self.field_components.values()
+                        for output in component.outputs]
+        return regions
+
+    def _draw_setup(self, axes):
+        """Draw the simulation setup into the given axes (implemented by the subclasses).
+
+        Args:
+            axes: Axes the setup is drawn into.
+        """
+
+        raise NotImplementedError
+
+    def _add_main_plot(self, axes):
+        """Add the plot of the observed component to the given axes (implemented by the
+        subclasses).
+
+        Args:
+            axes: Axes the plot is added to.
+
+        Returns:
+            main_plot: Artist showing the observed component.
+            update_plot: Function updating the plot with given values of the observed component.
+        """
+
+        raise NotImplementedError
+
+    def _open_video_pipe(self):
+        """Create a hidden figure with the resolution of the video, which the frames are rendered
+        to, and start ffmpeg reading its raw frames from a pipe to encode the video."""
 
-        answer = None
         if os.path.isfile(self.video_file_name):
             answer = input('File {} already exists. Overwrite? [y/N]'.format(self.video_file_name))
-            if answer.capitalize() == 'Y':
-                os.remove(self.video_file_name)
+            if answer.capitalize() != 'Y':
+                self._video_declined = True
+                return
+
+        # video codec requires the image size to be dividable by 2. Numbers (6.4 and 4.78)
+        # result from matplotlibs standard figure size.
+        video_width = int((self.video_dpi * 6.4) // 2 * 2)
+        video_height = int((self.video_dpi * 4.78) // 2 * 2)
+        figure = Figure(figsize=(video_width / self.video_dpi, video_height / self.video_dpi),
+                        dpi=self.video_dpi)
+        FigureCanvasAgg(figure)
+        self._video_axes = figure.add_subplot()
+        self._draw_setup(self._video_axes)
+        _, self._video_update = self._add_main_plot(self._video_axes)
+        # take the frame size from the rendered buffer, which may differ from the figure size by
+        # rounding
+        figure.canvas.draw()
+        height, width = np.shape(figure.canvas.buffer_rgba())[:2]
+
+        self._video_process = subprocess.Popen(
+            [self.ffmpeg_path, '-loglevel', 'error', '-y',
+             '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{}x{}'.format(width, height),
+             '-framerate', str(self.video_fps), '-i', '-',
+             '-pix_fmt', 'yuv420p', self.video_file_name],
+            stdin=subprocess.PIPE, bufsize=1 << 20)
+
+    def _save_frame(self, data):
+        """Render the given frame in the hidden video figure and write it to the ffmpeg pipe.
 
-        if not answer or answer.capitalize() == 'Y':
-            # video codec requires the image size to be dividable by 2. Numbers (6.4 and 4.78)
-            # result from matplotlibs standard figure size.
-            width = int((self.video_dpi * 6.4) // 2 * 2)
-            height = int((self.video_dpi * 4.78) // 2 * 2)
-            os.system('{} -loglevel error -framerate {} -i frame%06d.png -pix_fmt yuv420p -vf '
-                      'scale={}:{} {}'.format(self.ffmpeg_path, self.video_fps, width, height,
-                                              self.video_file_name))
+        Args:
+            data: Values of the observed component in the frame.
+        """
 
-        for file in self.image_files:
-            os.remove(file)
+        if self._video_process is None and not self._video_declined:
+            self._open_video_pipe()
+        if self._video_process is not None:
+            self._video_update(data)
+            self._video_axes.title.set_text(self.axes.title.get_text())
+            canvas = self._video_axes.figure.canvas
+            canvas.draw()
+            self._video_process.stdin.write(canvas.buffer_rgba())
+
+    def _create_video(self):
+        """Finish the video by closing the ffmpeg pipe."""
+
+        if self._video_process is not None:
+            self._video_process.stdin.close()
+            self._video_process.wait()
+            self._video_process = None
+            self._video_axes = None
+            self._video_update = None
 
 
 class Animator1D(Animator):
@@ -138,24 +357,60 @@ class Animator1D(Animator):
         super().__init__(*args, **kwargs)
 
         self.y_label = self.observed_component
+        self._shape_functions = {reg.PointRegion: self._point_shapes,
+                                 reg.LineRegion: self._line_shapes}
 
-    def plot_region(self, region):
+    def plot_region(self, region, axes=None):
         """Shows the given region in the field plot.
 
         Args:
             region: Region to be plotted.
+            axes: Axes the region is plotted in (the axes of the animation by default).
         """
 
-        if isinstance(region, reg.PointRegion):
-            self.axes.plot(np.ones(2) * region.point_coordinates / self._x_axis_factor,
-                           self.scale, color='black')
-        elif isinstance(region, reg.LineRegion):
-            self.axes.plot(np.ones(2) * region.line_coordinates[0] / self._x_axis_factor,
-                           self.scale, color='black')
-            self.axes.plot(np.ones(2) * region.line_coordinates[1] / self._x_axis_factor,
-                           self.scale, color='black')
-        else:
-            raise TypeError('Unknown type in region list: {}'.format(type(region)))
+        self.plot_regions([region], axes)
+
+    def plot_regions(self, regions, axes=None):
+        """Shows the given regions in the field plot as a single collection of lines.
+
+        Args:
+            regions: Regions to be plotted.
+            axes: Axes the regions are plotted in (the axes of the animation by default).
+        """
+
+        if axes is None:
+            axes = self.axes
+
+        lines = []
+        for region in regions:
+            lines += self._region_shapes(region)[1]
+
+        if lines:
+            axes.add_collection(mc.LineCollection(lines, colors='black'))
+
+    def _position_line(self, position):
+        """Returns a vertical line over the scale of the plot at the given position.
+
+        Args:
+            position: Position of the line.
+
+        Returns:
+            Start and end point of the line.
+        """
+
+        return [(position / self._x_axis_factor, self.scale[0]),
+                (position / self._x_axis_factor, self.scale[1])]
+
+    def _point_shapes(self, region):
+        """Returns the line marking a point region (see _region_shapes)."""
+
+        return 'lines', [self._position_line(region.point_coordinates)]
+
+    def _line_shapes(self, region):
+        """Returns the lines marking the ends of a line region (see _region_shapes)."""
+
+        return 'lines', [self._position_line(region.line_coordinates[0]),
+                         self._position_line(region.line_coordinates[1])]
 
     def show_setup(self, halt=True):
         """Open a plot window that shows the simulation setup including boundaries, outputs and
@@ -167,76 +422,52 @@ class Animator1D(Animator):
 
         pp.figure()
         self.axes = pp.gca()
-        self.axes.set_xlim(0, max(self.field.x.vector) / self._x_axis_factor)
-        self.axes.set_ylim(self.scale)
-        self.axes.set_xlabel('{0} / {1}m'.format(self.x_label, self._x_axis_prefix))
-        self.axes.set_ylabel(self.y_label)
-        pp.grid(True)
+        self._draw_setup(self.axes)
 
-        if self.show_materials:
-            for mat_region in self.field.material_regions:
-                self.plot_region(mat_region.region)
+        if halt:
+            pp.show()
 
-        if self.show_boundaries:
-            for name, component in self.field_components.items():
-                for boundary in component.boundaries:
-                    self.plot_region(boundary.region)
+    def _draw_setup(self, axes):
+        """Draw the simulation setup into the given axes.
 
-        if self.show_output:
-            for name, component in self.field_components.items():
-                for output in component.outputs:
-                    self.plot_region(output.region)
+        Args:
+            axes: Axes the setup is drawn into.
+        """
 
-        if halt:
-            pp.show()
+        axes.set(xlim=(0, self._x_max), ylim=self.scale,
+                 xlabel='{0} / {1}m'.format(self.x_label, self._x_axis_prefix),
+                 ylabel=self.y_label)
+        axes.grid(True)
+
+        self.plot_regions(self._shown_regions(), axes)
+
+    def _add_main_plot(self, axes):
+        """Add the plot of the observed component to the given axes.
+
+        Args:
+            axes: Axes the plot is added to.
+
+        Returns:
+            main_plot: Line showing the observed component.
+            update_plot: Function updating the line with given values of the observed component.
+        """
+
+        main_plot, = axes.plot([])
+        return main_plot, lambda data: main_plot.set_data(self._x_vector, data)
 
     def start_simulation(self):
         """Starts the simulation with visualization."""
 
         self.show_setup(halt=False)
-        main_plot, = self.axes.plot([])
+        main_plot, update_plot = self._add_main_plot(self.axes)
 
         # do not use multiprocessing if simulation is a single step
         if self.field.t.samples == 1:
             self.field.simulate()
-            data = getattr(self.field, self.observed_component).values
-            main_plot.set_data(self.field.x.vector / self._x_axis_factor, data)
+            update_plot(getattr(self.field, self.observed_component).values)
 
         else:
-            sim_process = mp.Process(target=self._sim_function, args=(self._plot_queue,))
-            sim_process.start()
-
-            # wait for simulation initialization
-            while self._plot_queue.empty():
-                pp.pause(0.1)
-
-            finished = False
-            while not finished:
-                # wait for new simulation result
-                while self._plot_queue.empty():
-                    pp.pause(0.01)
-
-                message = self._plot_queue.get()
-                # simulation function returns field object when simulation terminates to get output
-                if isinstance(message, fld.Field):
-                    # update main process field components with simulation result
-                    self._update_components(message)
-                    finished = True
-                else:
-                    time, data = message
-                    self.axes.title.set_text('{title} $t$ = {time:.{prec}f} {prefix}s'
-                                             .format(title=self.plot_title,
-                                                     time=time / self._t_factor,
-                                                     prec=self.time_precision,
-                                                     prefix=self._t_prefix))
-                    main_plot.set_data(self.field.x.vector / self._x_axis_factor, data)
-                    pp.pause(self.frame_delay)
-                    if self.save_video:
-                        self._save_frame()
-
-            sim_process.join()
-            if self.save_video:
-                self._create_video()
+            self._animate_simulation(main_plot, update_plot)
 
         pp.show()
 
@@ -254,49 +485,101 @@ class Animator2D(Animator):
 
         self._y_axis_prefix = self._x_axis_prefix
         self._y_axis_factor = self._x_axis_factor
+        self._y_max = self.field.y.vector[-1] / self._y_axis_factor
 
         self.y_label = '$y$'
         self.c_label = self.observed_component
+        self._shape_functions = {reg.PointRegion: self._point_shapes,
+                                 reg.LineRegion: self._line_shapes,
+                                 reg.RectRegion: self._rect_shapes,
+                                 reg.TriRegion: self._tri_shapes,
+                                 reg.EllipseRegion: self._ellipse_shapes}
 
-    def plot_region(self, region):
+    def plot_region(self, region, axes=None):
         """Shows the given region in the field plot.
 
         Args:
             region: Region to be plotted.
+            axes: Axes the region is plotted in (the axes of the animation by default).
         """
 
-        if isinstance(region, reg.PointRegion):
-            self.axes.scatter(region.point_coordinates[0] / self._x_axis_factor,
-                              region.point_coordinates[1] / self._y_axis_factor, color='black')
-        elif isinstance(region, reg.LineRegion):
-            self.axes.plot([region.line_coordinates[0] / self._x_axis_factor,
-                            region.line_coordinates[2] / self._x_axis_factor],
-                           [region.line_coordinates[1] / self._y_axis_factor,
-                            region.line_coordinates[3] / self._y_axis_factor],
-                           color='black')
-        elif isinstance(region, reg.RectRegion):
-            self.axes.add_patch(pa.Rectangle((region.rect_coordinates[0] / self._x_axis_factor,
-                                              region.rect_coordinates[1] / self._y_axis_factor),
-                                             region.rect_coordinates[2] / self._x_axis_factor,
-                                             region.rect_coordinates[3] / self._y_axis_factor,
-                                             fill=False))
-        elif isinstance(region, reg.TriRegion):
-            self.axes.add_patch(pa.Polygon(
-                np.array([[region.tri_coordinates[0] / self._x_axis_factor,
-                           region.tri_coordinates[1] / self._y_axis_factor],
-                          [region.tri_coordinates[2] / self._x_axis_factor,
-                           region.tri_coordinates[3] / self._y_axis_factor],
-                          [region.tri_coordinates[4] / self._x_axis_factor,
-                           region.tri_coordinates[5] / self._y_axis_factor]]),
-                fill=False))
-        elif isinstance(region, reg.EllipseRegion):
-            self.axes.add_patch(pa.Ellipse(
-                (region.centre[0] / self._x_axis_factor, region.centre[1] / self._y_axis_factor),
-                2 * region.radii[0] / self._x_axis_factor,
-                2 * region.radii[1] / self._y_axis_factor,
-                fill=False))
-        else:
-            raise TypeError('Unknown type in region list: {}'.format(type(region)))
+        self.plot_regions([region], axes)
+
+    def plot_regions(self, regions, axes=None):
+        """Shows the given regions in the field plot, with one collection each for points, lines
+        and areas.
+
+        Args:
+            regions: Regions to be plotted.
+            axes: Axes the regions are plotted in (the axes of the animation by default).
+        """
+
+        if axes is None:
+            axes = self.axes
+
+        shapes = {'points': [], 'lines': [], 'patches': []}
+        for region in regions:
+            kind, region_shapes = self._region_shapes(region)
+            shapes[kind] += region_shapes
+
+        if shapes['points']:
+            axes.scatter(*np.transpose(shapes['points']), color='black')
+        if shapes['lines']:
+            axes.add_collection(mc.LineCollection(shapes['lines'], colors='black'))
+        if shapes['patches']:
+            axes.add_collection(mc.PatchCollection(shapes['patches'], facecolors='none',
+                                                   edgecolors='black'))
+
+    def _point_shapes(self, region):
+        """Returns the point of a point region (see _region_shapes)."""
+
+        return 'points', [(region.point_coordinates[0] / self._x_axis_factor,
+                           region.point_coordinates[1] / self._y_axis_factor)]
+
+    def _line_shapes(self, region):
+        """Returns the line of a line region (see _region_shapes)."""
+
+        return 'lines', [[(region.line_coordinates[0] / self._x_axis_factor,
+                           region.line_coordinates[1] / self._y_axis_factor),
+                          (region.line_coordinates[2] / self._x_axis_factor,
+                           region.line_coordinates[3] / self._y_axis_factor)]]
+
+    def _rect_shapes(self, region):
+        """Returns the rectangle of a rectangular region (see _region_shapes)."""
+
+        return 'patches', [pa.Rectangle((region.rect_coordinates[0] / self._x_axis_factor,
+                                         region.rect_coordinates[1] / self._y_axis_factor),
+                                        region.rect_coordinates[2] / self._x_axis_factor,
+                                        region.rect_coordinates[3] / self._y_axis_factor)]
+
+    def _tri_shapes(self, region):
+        """Returns the triangle of a triangular region (see _region_shapes)."""
+
+        return 'patches', [pa.Polygon(
+            np.array([[region.tri_coordinates[0] / self._x_axis_factor,
+                       region.tri_coordinates[1] / self._y_axis_factor],
+                      [region.tri_coordinates[2] / self._x_axis_factor,
+                       region.tri_coordinates[3] / self._y_axis_factor],
+                      [region.tri_coordinates[4] / self._x_axis_factor,
+                       region.tri_coordinates[5] / self._y_axis_factor]]))]
+
+    def _ellipse_shapes(self, region):
+        """Returns the ellipse of an elliptic region (see _region_shapes)."""
+
+        return 'patches', [pa.Ellipse(
+            (region.centre[0] / self._x_axis_factor, region.centre[1] / self._y_axis_factor),
+            2 * region.radii[0] / self._x_axis_factor,
+            2 * region.radii[1] / self._y_axis_factor)]
+
+    def _frame_shape(self):
+        """Returns the shape of the frames of the observed component passed to the plot, which
+        is taken from the field, so components do not need to know it.
+
+        Returns:
+            Shape of the frames.
+        """
+
+        return self.field.y.samples, self.field.x.samples
 
     def field_as_matrix(self, component=None):
         """Returns a field component (observed component by default) as a numpy matrix.
@@ -323,86 +606,100 @@ class Animator2D(Animator):
 
         pp.figure()
         self.axes = pp.gca()
-        pp.axis('equal')
-        self.axes.set_xlim(0, max(self.field.x.vector) / self._x_axis_factor)
-        self.axes.set_ylim(0, max(self.field.y.vector) / self._y_axis_factor)
-        self.axes.set_xlabel('{0} / {1}m'.format(self.x_label, self._x_axis_prefix))
-        self.axes.set_ylabel('{0} / {1}m'.format(self.y_label, self._y_axis_prefix))
+        self._draw_setup(self.axes)
 
-        if self.show_materials:
-            for mat_region in self.field.material_regions:
-                self.plot_region(mat_region.region)
+        if halt:
+            pp.show()
 
-        if self.show_boundaries:
-            for name, component in self.field_components.items():
-                for boundary in component.boundaries:
-                    self.plot_region(boundary.region)
+    def _draw_setup(self, axes):
+        """Draw the simulation setup into the given axes.
 
-        if self.show_output:
-            for name, component in self.field_components.items():
-                for output in component.outputs:
-                    self.plot_region(output.region)
+        Args:
+            axes: Axes the setup is drawn into.
+        """
 
-        if halt:
-            pp.show()
+        axes.axis('equal')
+        axes.set(xlim=(0, self._x_max), ylim=(0, self._y_max),
+                 xlabel='{0} / {1}m'.format(self.x_label, self._x_axis_prefix),
+                 ylabel='{0} / {1}m'.format(self.y_label, self._y_axis_prefix))
+
+        self.plot_regions(self._shown_regions(), axes)
+
+    def _add_main_plot(self, axes):
+        """Add the image of the observed component and its color bar to the given axes.
+
+        Args:
+            axes: Axes the image is added to.
+
+        Returns:
+            main_plot: Image showing the observed component.
+            update_plot: Function updating the image with given values of the observed component.
+        """
+
+        main_plot = axes.imshow(self.field_as_matrix(),
+                                extent=(0, self._x_max, self._y_max, 0),
+                                cmap='viridis')
+        main_plot.set_clim(self.scale)
+        color_bar = axes.figure.colorbar(main_plot, ax=axes)
+        color_bar.set_label(self.observed_component, rotation=270)
+        return main_plot, main_plot.set_data
 
     def start_simulation(self):
         """Starts the simulation with visualization."""
 
         self.show_setup(halt=False)
-        main_plot = self.axes.imshow(self.field_as_matrix(),
-                                     extent=(0, max(self.field.x.vector) / self._x_axis_factor,
-                                             max(self.field.y.vector) / self._y_axis_factor, 0),
-                                     cmap='viridis')
-        main_plot.set_clim(self.scale)
-        color_bar = pp.colorbar(main_plot)
-        color_bar.set_label(self.observed_component, rotation=270)
+        main_plot, update_plot = self._add_main_plot(self.axes)
 
         # do not use multiprocessing if simulation is a single step
         if self.field.t.samples == 1:
             self.field.simulate()
             data = getattr(self.field, self.observed_component).values
-            main_plot.set_data(self.field_as_matrix(data))
+            update_plot(self.field_as_matrix(data))
 
         else:
-            sim_process = mp.Process(target=self._sim_function, args=(self._plot_queue,))
-            sim_process.start()
-
-            # wait for simulation initialization
-            while self._plot_queue.empty():
-                pp.pause(0.1)
-
-            finished = False
-            while not finished:
-                # wait for new simulation result
-                while self._plot_queue.empty():
-                    pp.pause(0.01)
-
-                message = self._plot_queue.get()
-                # simulation function returns field object when simulation terminates to get output
-                if isinstance(message, fld.Field):
-                    # update main process field components with simulation result
-                    self._update_components(message)
-                    finished = True
-                else:
-                    time, data = message
-                    self.axes.title.set_text('{title} $t$ = {time:.{prec}f} {prefix}s'
-                                             .format(title=self.plot_title,
-                                                     time=time / self._t_factor,
-                                                     prec=self.time_precision,
-                                                     prefix=self._t_prefix))
-                    main_plot.set_data(self.field_as_matrix(data))
-                    pp.pause(self.frame_delay)
-                    if self.save_video:
-                        self._save_frame()
-
-            sim_process.join()
-            if self.save_video:
-                self._create_video()
+            self._animate_simulation(main_plot, update_plot)
 
         pp.show()
 
 
+def _simulate_frames(field, observed_component, steps_per_frame, save_video, queue, frames,
+                     frame_dtype, frame_shape, free_slots):
+    """Simulation function of the animation to be started as a separate process or thread.
+
+    Args:
+        field: Field to be simulated.
+        observed_component: Name of the component shown in the animation.
+        steps_per_frame: Simulation steps between frames.
+        save_video: Every frame is passed to the animation if it is saved as video.
+        queue: Queue that is used to transfer the time and the slot of each frame between
+            simulation and visualization.
+        frames: Shared memory with two slots for the values of the observed component.
+        frame_dtype: Data type of the values in the frames.
+        frame_shape: Shape of the frames.
+        free_slots: Semaphore counting the slots not read by the visualization yet. Frames are
+            dropped if no slot is free, unless the animation is saved as video.
+    """
+
+    frame_slots = np.frombuffer(frames, dtype=frame_dtype).reshape((2,) + frame_shape)
+
+    slot = 1
+    num_frames = int(field.t.samples / steps_per_frame)
+    for ii in range(num_frames):
+        field.simulate(steps_per_frame)
+        # drop the frame if the plot is two frames behind, unless every frame is recorded
+        # (the last frame is always shown). The flag is passed positionally, as threading and
+        # multiprocessing name it differently
+        if not free_slots.acquire(save_video or ii == num_frames - 1):
+            continue
+        slot = 1 - slot
+        np.copyto(frame_slots[slot],
+                  getattr(field, observed_component).values.reshape(frame_shape))
+        queue.put((field.t.vector[field.step - 1], slot))
+
+    # return field when simulation finishes to get output signals
+    queue.put(field)
+
+
 def get_prefix(value):
     """Determine the metric prefix for a given value.
 
@@ -413,10 +710,16 @@ def get_prefix(value):
         prefix: String specifying the prefix.
         factor: Scale factor of the prefix.
     """
-    for factor, prefix in sorted(prefixes.items()):
-        if value / factor < 1e3:
-            break
-    return prefix, factor
+    if value == 0:
+        return '', 1e0
+
+    exponent = min(max(math.floor(math.log10(abs(value)) / 3) * 3, -24), 24)
+    # correct rounding errors of the logarithm at powers of 1000
+    if abs(value) / 10.0 ** exponent >= 1e3 and exponent < 24:
+        exponent += 3
+    elif abs(value) / 10.0 ** exponent < 1 and exponent > -24:
+        exponent -= 3
+    return _prefixes_by_exponent[exponent]
 
 
 prefixes = {
@@ -438,3 +741,6 @@ prefixes = {
     1e21: 'Z',
     1e24: 'Y',
 }
+
+_prefixes_by_exponent = {int(round(math.log10(factor))): (prefix, factor)
+                         for factor, prefix in prefixes.items()}
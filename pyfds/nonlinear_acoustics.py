@@ -10,6 +10,13 @@ __all__ = [
 class IdealGas1D(fld.Field1D):
     """Class for simulation of one-dimensional nonlinear acoustic fields in ideal gases."""
 
+    a_d_v = fld._StencilMatrix('d_x', '_ratio')
+    a_v_p = fld._StencilMatrix('d_x', '_ratio', variant='backward')
+    a_v_v = fld._StencilMatrix('d_x2', '_absorption_factors')
+    a_v_v2 = fld._StencilMatrix('d_x', '_ratio', 1 / 2, variant='central')
+    _transient_attributes = ('_total_density', '_velocity_change', '_product', '_d_x_forward',
+                             '_d_x_backward', '_d_x_central', '_d_x2')
+
     def __init__(self, convective=True, nl_state=True, *args, **kwargs):
         """Class constructor.
 
@@ -26,30 +33,46 @@ class IdealGas1D(fld.Field1D):
         self.velocity = fld.FieldComponent(self.num_points)
         self.density = fld.FieldComponent(self.num_points)
 
-        # initialize attributes sparse matrices and buffered material parameters
-        self.a_d_v = None
-        self.a_v_p = None
-        self.a_v_v = None
-        self.a_v_v2 = None
+        # initialize attributes for the factors of the stencils and buffered material parameters
+        self._ratio = None
         self.stat_density = None
         self.sound_velocity = None
         self.heat_cap_ratio = None
+        self._inv_stat_density = None
+        self._eos_factors = None
+        self._squared_sound_velocity = None
+        self._total_density = None
+        self._velocity_change = None
+        self._product = None
+        self._absorption_factors = None
+        self._d_x_forward = None
+        self._d_x_backward = None
+        self._d_x_central = None
+        self._d_x2 = None
 
     def assemble_matrices(self):
-        """Assemble the a_* matrices and buffer material parameters required for simulation."""
-
-        self.a_d_v = self.d_x(factors=(self.t.increment / self.x.increment
-                                       * np.ones(self.x.samples)))
-        self.a_v_p = self.d_x(factors=(self.t.increment / self.x.increment)
-                              * np.ones(self.x.samples), variant='backward')
-        self.a_v_v = self.d_x2(factors=(self.t.increment / self.x.increment ** 2
-                                        * self.material_vector('absorption_coef')))
-        self.a_v_v2 = self.d_x(factors=(self.t.increment / self.x.increment / 2)
-                               * np.ones(self.x.samples), variant='central')
+        """Assemble the factors of the stencils equivalent to the a_* matrices and buffer the
+        material parameters of the ideal gas."""
+
+        self._ratio = self.t.increment / self.x.increment
+        self._absorption_factors = (self.t.increment / self.x.increment ** 2
+                                    * self.material_vector('absorption_coef'))
         self.stat_density = self.material_vector('density')
         self.sound_velocity = self.material_vector('sound_velocity')
         self.heat_cap_ratio = (self.material_vector('isobaric_heat_cap')
                                / self.material_vector('isochoric_heat_cap'))
+        # constant factors of the equations of state
+        self._inv_stat_density = 1 / self.stat_density
+        self._squared_sound_velocity = self.sound_velocity ** 2
+        self._eos_factors = self.stat_density * self._squared_sound_velocity / self.heat_cap_ratio
+        self._total_density = np.empty(self.num_points, dtype=self.dtype)
+        self._velocity_change = np.empty(self.num_points, dtype=self.dtype)
+        self._product = np.empty(self.num_points, dtype=self.dtype)
+        self._d_x_forward = self.compile_stencil('forward')
+        self._d_x_backward = self.compile_stencil('backward')
+        self._d_x_central = self.compile_stencil('central')
+        self._d_x2 = self.compile_stencil(order=2)
+        self._discard_stencil_matrices()
         self.matrices_assembled = True
 
     def sim_step(self):
@@ -58,35 +81,43 @@ class IdealGas1D(fld.Field1D):
         self.pressure.apply_bounds(self.step)
         self.pressure.write_outputs()
 
+        # total density, shared by the velocity and the density update
+        total_density = np.add(self.stat_density, self.density.values, out=self._total_density)
+
+        # pressure gradient and absorption share the division by the density, the products with
+        # a_v_p, a_v_v and a_v_v2 are accumulated in a buffer
+        ratio = self._ratio
+        velocity_change = self._d_x_backward(ratio, self.pressure.values, self._velocity_change)
+        velocity_change -= self._d_x2(self._absorption_factors, self.velocity.values,
+                                      self._product)
+        velocity_change /= total_density
         if self.convective:
-            self.velocity.values -= (self.a_v_p.dot(self.pressure.values)
-                                     / (self.stat_density + self.density.values)
-                                     + self.a_v_v2.dot(self.velocity.values)
-                                     - self.a_v_v.dot(self.velocity.values)
-                                     / (self.stat_density + self.density.values))
-        else:
-            self.velocity.values -= (self.a_v_p.dot(self.pressure.values)
-                                     / (self.stat_density + self.density.values)
-                                     - self.a_v_v.dot(self.velocity.values)
-                                     / (self.stat_density + self.density.values))
+            velocity_change += self._d_x_central(ratio / 2, self.velocity.values, self._product)
+        self.velocity.values -= velocity_change
 
         self.velocity.apply_bounds(self.step)
         self.velocity.write_outputs()
 
-        self.density.values -= self.a_d_v.dot((self.density.values + self.stat_density)
-                                              * self.velocity.values)
+        # mass flux, computed in the buffer of the total density which is not needed anymore
+        total_density *= self.velocity.values
+        self.density.values -= self._d_x_forward(ratio, total_density, self._product)
 
         self.density.apply_bounds(self.step)
         self.density.write_outputs()
 
+        # the equation of state is evaluated in place in the pressure values
+        pressure = self.pressure.values
         if self.nl_state:
-            # using modified equation of state, so static pressure is not required
-            self.pressure.values = \
-                self.stat_density * self.sound_velocity**2 / self.heat_cap_ratio * \
-                (((self.stat_density + self.density.values)
-                  / self.stat_density)**self.heat_cap_ratio - 1)
+            # using modified equation of state, so static pressure is not required; the power of
+            # the relative density is evaluated as expm1(gamma * log1p(density / stat_density)),
+            # which is faster than power and avoids cancellation for small density changes
+            np.multiply(self.density.values, self._inv_stat_density, out=pressure)
+            np.log1p(pressure, out=pressure)
+            pressure *= self.heat_cap_ratio
+            np.expm1(pressure, out=pressure)
+            pressure *= self._eos_factors
         else:
-            self.pressure.values = self.sound_velocity**2 * self.density.values
+            np.multiply(self._squared_sound_velocity, self.density.values, out=pressure)
 
     def is_stable(self):
         """Checks if simulation satisfies stability conditions. Does not account for instability
@@ -96,14 +127,25 @@ class IdealGas1D(fld.Field1D):
             True if stable, False if not.
         """
 
-        return np.all(self.material_vector('sound_velocity')
-                      < 0.99 * self.x.increment / self.t.increment)
+        # the sound velocity buffered by assemble_matrices is up to date while it is assembled
+        if self.matrices_assembled:
+            sound_velocity = self.sound_velocity
+        else:
+            sound_velocity = self.material_vector('sound_velocity')
+        return np.max(sound_velocity) < 0.99 * self.x.increment / self.t.increment
 
 
 class Acoustic2ndOrder1D(fld.Field1D):
     """Class for simulation of one-dimensional nonlinear acoustic fields using second order
     approximation."""
 
+    a_d_v = fld._StencilMatrix('d_x', '_ratio')
+    a_v_p = fld._StencilMatrix('d_x', '_ratio', variant='backward')
+    a_v_v = fld._StencilMatrix('d_x2', '_absorption_factors')
+    a_v_v2 = fld._StencilMatrix('d_x', '_ratio', 1 / 2, variant='central')
+    _transient_attributes = ('_total_density', '_velocity_change', '_product', '_d_x_forward',
+                             '_d_x_backward', '_d_x_central', '_d_x2')
+
     def __init__(self, *args, **kwargs):
         """Class constructor.
 
@@ -121,29 +163,40 @@ class Acoustic2ndOrder1D(fld.Field1D):
         self.velocity = fld.FieldComponent(self.num_points)
         self.density = fld.FieldComponent(self.num_points)
 
-        # initialize attributes sparse matrices and buffered material parameters
-        self.a_d_v = None
-        self.a_v_p = None
-        self.a_v_v = None
-        self.a_v_v2 = None
+        # initialize attributes for the factors of the stencils and buffered material parameters
+        self._ratio = None
         self.stat_density = None
         self.d_rho_p = None
         self.d_rho2_p = None
+        self._half_d_rho2_p = None
+        self._total_density = None
+        self._velocity_change = None
+        self._product = None
+        self._absorption_factors = None
+        self._d_x_forward = None
+        self._d_x_backward = None
+        self._d_x_central = None
+        self._d_x2 = None
 
     def assemble_matrices(self):
-        """Assemble the a_* matrices and buffer material parameters required for simulation."""
-
-        self.a_d_v = self.d_x(factors=(self.t.increment / self.x.increment
-                                       * np.ones(self.x.samples)))
-        self.a_v_p = self.d_x(factors=(self.t.increment / self.x.increment)
-                              * np.ones(self.x.samples), variant='backward')
-        self.a_v_v = self.d_x2(factors=(self.t.increment / self.x.increment ** 2
-                                        * self.material_vector('absorption_coef')))
-        self.a_v_v2 = self.d_x(factors=(self.t.increment / self.x.increment / 2)
-                               * np.ones(self.x.samples), variant='central')
+        """Assemble the factors of the stencils equivalent to the a_* matrices and buffer the
+        derivatives of the second order equation of state."""
+
+        self._ratio = self.t.increment / self.x.increment
+        self._absorption_factors = (self.t.increment / self.x.increment ** 2
+                                    * self.material_vector('absorption_coef'))
         self.stat_density = self.material_vector('density')
         self.d_rho_p = self.material_vector('d_rho_p')
         self.d_rho2_p = self.material_vector('d_rho2_p')
+        self._half_d_rho2_p = self.d_rho2_p / 2
+        self._total_density = np.empty(self.num_points, dtype=self.dtype)
+        self._velocity_change = np.empty(self.num_points, dtype=self.dtype)
+        self._product = np.empty(self.num_points, dtype=self.dtype)
+        self._d_x_forward = self.compile_stencil('forward')
+        self._d_x_backward = self.compile_stencil('backward')
+        self._d_x_central = self.compile_stencil('central')
+        self._d_x2 = self.compile_stencil(order=2)
+        self._discard_stencil_matrices()
         self.matrices_assembled = True
 
     def sim_step(self):
@@ -152,23 +205,34 @@ class Acoustic2ndOrder1D(fld.Field1D):
         self.pressure.apply_bounds(self.step)
         self.pressure.write_outputs()
 
-        self.velocity.values -= (self.a_v_p.dot(self.pressure.values)
-                                 / (self.stat_density + self.density.values)
-                                 + self.a_v_v2.dot(self.velocity.values)
-                                 - self.a_v_v.dot(self.velocity.values)
-                                 / (self.stat_density + self.density.values))
+        # total density, shared by the velocity and the density update
+        total_density = np.add(self.stat_density, self.density.values, out=self._total_density)
+
+        # pressure gradient and absorption share the division by the density, the products with
+        # a_v_p, a_v_v and a_v_v2 are accumulated in a buffer
+        ratio = self._ratio
+        velocity_change = self._d_x_backward(ratio, self.pressure.values, self._velocity_change)
+        velocity_change -= self._d_x2(self._absorption_factors, self.velocity.values,
+                                      self._product)
+        velocity_change /= total_density
+        velocity_change += self._d_x_central(ratio / 2, self.velocity.values, self._product)
+        self.velocity.values -= velocity_change
 
         self.velocity.apply_bounds(self.step)
         self.velocity.write_outputs()
 
-        self.density.values -= self.a_d_v.dot((self.density.values + self.stat_density)
-                                              * self.velocity.values)
+        # mass flux, computed in the buffer of the total density which is not needed anymore
+        total_density *= self.velocity.values
+        self.density.values -= self._d_x_forward(ratio, total_density, self._product)
 
         self.density.apply_bounds(self.step)
         self.density.write_outputs()
 
-        self.pressure.values = self.d_rho_p * self.density.values + \
-            self.d_rho2_p / 2 * self.density.values**2
+        # second order equation of state evaluated in place in Horner form
+        pressure = self.pressure.values
+        np.multiply(self._half_d_rho2_p, self.density.values, out=pressure)
+        pressure += self.d_rho_p
+        pressure *= self.density.values
 
 
 class AcousticMaterial2ndOrder(ac.AcousticMaterial):
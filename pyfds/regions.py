@@ -13,12 +13,36 @@ class Region:
         """Class constructor.
 
         Args:
-            indices: Point indices of the region.
+            indices: Point indices of the region as list or integer array.
             name: Name of the region.
         """
 
+        # incremented whenever the indices are replaced, so caches can detect the change
+        self.version = 0
         self.indices = indices
         self.name = name
+        self._index_array = None
+
+    @property
+    def indices(self):
+        """Point indices of the region. Replace them instead of modifying them in place, so
+        fields and components using the region notice the change."""
+
+        return self._indices
+
+    @indices.setter
+    def indices(self, indices):
+        self._indices = indices
+        self.version += 1
+
+    @property
+    def index_array(self):
+        """Returns the indices as an integer array, which is cached as long as the indices are
+        not replaced, to avoid converting lists of indices for every use as fancy index."""
+
+        if self._index_array is None or self._index_array[0] is not self.indices:
+            self._index_array = (self.indices, np.asarray(self.indices, dtype=np.intp))
+        return self._index_array[1]
 
 
 class PointRegion(Region):
@@ -56,17 +80,20 @@ class LineRegion(Region):
 class RectRegion(Region):
     """Region specified by a rectangular field of points."""
 
-    def __init__(self, indices, coordinates, name=''):
+    def __init__(self, indices, coordinates, name='', block=None):
         """Class constructor.
 
         Args:
             indices: Point indices of the region.
             coordinates: Coordinates of the region.
             name: Name of the region.
+            block: Slices in y and x direction selecting the region from the values of the field
+                in its shape, if the indices are ordered row by row (optional).
         """
 
         super().__init__(indices, name)
         self.rect_coordinates = coordinates
+        self.block = block
 
 
 class TriRegion(Region):
@@ -118,10 +145,55 @@ class Boundary:
                 set directly.
         """
 
+        # incremented whenever an attribute is replaced, so caches can detect the change
+        self.version = 0
         self.region = region
         self.value = value
         self.additive = additive
 
+    @property
+    def region(self):
+        """Region the boundary is applied to."""
+
+        return self._region
+
+    @region.setter
+    def region(self, region):
+        self._region = region
+        self.version += 1
+
+    @property
+    def additive(self):
+        """Specifies if the boundary is additive to the field."""
+
+        return self._additive
+
+    @additive.setter
+    def additive(self, additive):
+        self._additive = additive
+        self.version += 1
+
+    @property
+    def value(self):
+        """Value the boundary applies to the field."""
+
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.version += 1
+        # the kind of value is resolved once, so a step only has to pick its row of the signals
+        if np.ndim(value) == 0:
+            # if a single value is given
+            self._step_values = None
+        elif isinstance(value, np.ndarray):
+            # if a signal is given
+            self._step_values = value
+        else:
+            # if a list of signals for each index is given, they are stacked with one row per step
+            self._step_values = np.stack([np.asarray(signal) for signal in value], axis=1)
+
     def apply(self, old_values, step):
         """Apply the boundary.
 
@@ -133,36 +205,182 @@ class Boundary:
             New values for the points in the boundary.
         """
 
-        if np.ndim(self.value) == 0:
-            # if a single value is given
-            return self.additive * old_values + self.value
-        elif isinstance(self.value, np.ndarray):
-            # if a signal is given
-            return self.additive * old_values + self.value[step]
-        else:
-            # if a list of signals for each index is given
-            return [self.additive * old_values[ii] + signal[step]
-                    for ii, signal in enumerate(self.value)]
+        return self.additive * old_values + self.step_value(step)
+
+    def step_value(self, step):
+        """Value the boundary applies in the given step (without old values if additive).
+
+        Args:
+            step: Time step of the simulation (required if signals are to be applied).
+
+        Returns:
+            Scalar value or values for the points in the boundary.
+        """
+
+        if self._step_values is None:
+            return self._value
+        return self._step_values[step]
 
 
 class Output:
     """Specifies values to be extracted from the FieldComponent after each simulation step."""
 
-    def __init__(self, region):
+    # minimum number of steps the signal buffer is grown by if it is full
+    block_size = 1024
+
+    def __init__(self, region, num_steps=None):
         """Class constructor.
 
         Args:
             region: Region the out is recorded at.
+            num_steps: Number of steps to reserve memory for (optional, the signals are extended
+                as needed).
         """
 
         self.region = region
+        self.stream = None
+        self._stream_buffer = None
+        self._buffered_steps = 0
+        self._num_steps = num_steps
         self.signals = []
 
+    @property
+    def signals(self):
+        """Signals of all points in the region as list with one list of values per point. The
+        values are recorded in an array (see signal_array), the list is converted from it and
+        kept, so accessing it again only appends the steps recorded since. Modifications of the
+        list are not written back to the array."""
+
+        new_steps = self._signal_buffer[self._listed_steps:self._recorded_steps]
+        if len(new_steps):
+            if not self._signal_list:
+                self._signal_list.extend([] for _ in range(new_steps.shape[1]))
+            for signal, values in zip(self._signal_list, new_steps.T.tolist()):
+                signal.extend(values)
+            self._listed_steps = self._recorded_steps
+        return self._signal_list
+
+    @signals.setter
+    def signals(self, signals):
+        self._signal_buffer = np.empty((0, len(self.region.indices)))
+        self._recorded_steps = 0
+        if len(signals):
+            # the buffer has one row per step, so recording a step writes contiguous memory
+            self._signal_buffer = np.array(np.transpose(signals), dtype=float, order='C', ndmin=2)
+            self._recorded_steps = len(self._signal_buffer)
+        self._signal_list = []
+        self._listed_steps = 0
+        self._mean_buffer = np.empty(0)
+        self._averaged_steps = 0
+
+    @property
+    def signal_array(self):
+        """Signals of all points in the region as array with one row per point. The array is a
+        read-only view of the recorded values, so the means kept by mean_signal stay valid."""
+
+        signal_array = self._signal_buffer[:self._recorded_steps].T
+        signal_array.flags.writeable = False
+        return signal_array
+
     @property
     def mean_signal(self):
-        """Return the mean signal of all points in the region."""
+        """Return the mean signal of all points in the region. The means of the recorded steps are
+        kept, so accessing the mean signal repeatedly during a simulation only averages the new
+        steps."""
+
+        if len(self._mean_buffer) < len(self._signal_buffer):
+            mean_buffer = np.empty(len(self._signal_buffer))
+            mean_buffer[:self._averaged_steps] = self._mean_buffer[:self._averaged_steps]
+            self._mean_buffer = mean_buffer
+        np.mean(self._signal_buffer[self._averaged_steps:self._recorded_steps], axis=1,
+                out=self._mean_buffer[self._averaged_steps:self._recorded_steps])
+        self._averaged_steps = self._recorded_steps
+        return self._mean_buffer[:self._recorded_steps].copy()
+
+    def reserve(self, num_steps):
+        """Reserves memory for the signals of further steps, so they are recorded without
+        growing the signals (called by pyfds.fields.Field.simulate).
+
+        Args:
+            num_steps: Number of further steps.
+        """
+
+        if self.stream is None and self._recorded_steps + num_steps > len(self._signal_buffer):
+            self._grow(self._recorded_steps + num_steps)
+
+    def _grow(self, num_steps):
+        """Reallocates the array of the signals with memory for the given number of steps and
+        copies the recorded steps.
+
+        Args:
+            num_steps: Number of steps.
+        """
+
+        signal_buffer = np.empty((num_steps, len(self.region.indices)))
+        signal_buffer[:self._recorded_steps] = self._signal_buffer[:self._recorded_steps]
+        self._signal_buffer = signal_buffer
+
+    def record(self, values, indices=None):
+        """Append the values of a single step to the signals.
+
+        Args:
+            values: Values of the points in the region, or of the field if indices are given.
+            indices: Indices of the points in the values (optional), which are then gathered
+                directly into the signals.
+        """
 
-        return np.mean(np.asarray(self.signals), axis=0)
+        if self._recorded_steps == len(self._signal_buffer):
+            # the signals grow geometrically, so the recorded steps are copied rarely
+            self._grow(max(self._num_steps or self.block_size, 2 * self._recorded_steps,
+                           self._recorded_steps + self.block_size))
+
+        _gather(values, indices, self._signal_buffer[self._recorded_steps])
+        self._recorded_steps += 1
+
+    def open_stream(self, file_name, chunk=4096):
+        """Write the output to a file instead of keeping the signals in memory. Values are
+        collected in a buffer of chunk steps which is appended to the file when full, so memory
+        usage is bounded for long simulations. The file contains the values as float64 with one
+        row per step and can be read with numpy.fromfile(file_name).reshape(-1, num_indices).
+        Call close_stream when the simulation is finished.
+
+        Args:
+            file_name: Name of the file the output is written to.
+            chunk: Number of steps buffered before the buffer is written to the file.
+        """
+
+        self.stream = open(file_name, 'wb')
+        self._stream_buffer = np.empty((int(chunk), len(self.region.indices)))
+        self._buffered_steps = 0
+
+    def write_stream(self, values, indices=None):
+        """Append the values of a single step to the stream.
+
+        Args:
+            values: Values of the points in the region, or of the field if indices are given.
+            indices: Indices of the points in the values (optional), which are then gathered
+                directly into the buffer.
+        """
+
+        _gather(values, indices, self._stream_buffer[self._buffered_steps])
+        self._buffered_steps += 1
+        if self._buffered_steps == len(self._stream_buffer):
+            self.flush_stream()
+
+    def flush_stream(self):
+        """Write the buffered steps to the stream."""
+
+        self._stream_buffer[:self._buffered_steps].tofile(self.stream)
+        self.stream.flush()
+        self._buffered_steps = 0
+
+    def close_stream(self):
+        """Write remaining buffered steps and close the stream."""
+
+        self.flush_stream()
+        self.stream.close()
+        self.stream = None
+        self._stream_buffer = None
 
 
 class MaterialRegion:
@@ -176,5 +394,37 @@ class MaterialRegion:
             material: Material of the specified region.
         """
 
+        # incremented whenever the region is replaced, so caches can detect the change
+        self.version = 0
         self.region = region
         self.materials = [material]
+
+    @property
+    def region(self):
+        """Region the material is set."""
+
+        return self._region
+
+    @region.setter
+    def region(self, region):
+        self._region = region
+        self.version += 1
+
+
+def _gather(values, indices, out):
+    """Writes the values at the given indices to out without a temporary array if possible.
+
+    Args:
+        values: Values to be written.
+        indices: Indices of the values to be written (all values if None).
+        out: Array the values are written to.
+    """
+
+    if indices is None:
+        out[...] = values
+    elif values.dtype == out.dtype:
+        # the method avoids the Python level dispatch of numpy.take, which is called every step
+        values.take(indices, out=out)
+    else:
+        # take does not cast to the type of out
+        out[...] = values[indices]
@@ -9,9 +9,49 @@ __all__ = [
 logger = lo.getLogger('pyfds')
 
 
-class Thermal1D(fld.Field1D):
+class _ThermalField:
+    """Methods shared by the thermal fields, which simulate with stencil kernels."""
+
+    _transient_attributes = ('_temperature_change', '_product', '_row_radii', '_d_x_forward',
+                             '_d_x_backward', '_d_y_forward', '_d_y_backward')
+
+    @staticmethod
+    def _uniform(factors):
+        """Reduces the factors of a stencil to a scalar if they are equal for all points (e.g. for
+        a uniform material), so the steps do not have to read a vector of factors.
+
+        Args:
+            factors: Factor for each point.
+
+        Returns:
+            Scalar factor if all factors are equal, else the factors.
+        """
+
+        if np.all(factors == factors[0]):
+            return factors[0].item()
+        return factors
+
+    def _compile_stencils(self):
+        """Compiles the stencil kernels and allocates the buffers of the field, unless this has
+        been done for the data type of the field before."""
+
+        if not _outdated(self._temperature_change, self.dtype):
+            return
+        self._temperature_change = np.empty(self.num_points, dtype=self.dtype)
+        self._d_x_forward = self.compile_stencil('forward')
+        self._d_x_backward = self.compile_stencil('backward')
+        if isinstance(self, fld.Field2D):
+            self._product = np.empty(self.num_points, dtype=self.dtype)
+            self._d_y_forward = self.compile_stencil('forward', direction='y')
+            self._d_y_backward = self.compile_stencil('backward', direction='y')
+
+
+class Thermal1D(_ThermalField, fld.Field1D):
     """Class for simulation of one-dimensional thermal fields."""
 
+    a_t_q = fld._StencilMatrix('d_x', '_t_q_factors')
+    a_q_t = fld._StencilMatrix('d_x', '_q_t_factors', -1, variant='backward')
+
     def __init__(self, *args, **kwargs):
         """Class constructor.
 
@@ -22,19 +62,24 @@ class Thermal1D(fld.Field1D):
         self.temperature = fld.FieldComponent(self.num_points)
         self.heat_flux = fld.FieldComponent(self.num_points)
 
-        # initialize attributes sparse matrices
-        self.a_t_q = None
-        self.a_q_t = None
+        # initialize attributes for the factors of the stencils and buffers
+        self._t_q_factors = None
+        self._q_t_factors = None
+        self._temperature_change = None
+        self._d_x_forward = None
+        self._d_x_backward = None
 
     def assemble_matrices(self):
-        """Assemble the a_* matrices required for simulation."""
-
-        self.a_t_q = self.d_x(factors=(self.t.increment / self.x.increment
-                                       / self.material_vector('density')
-                                       / self.material_vector('heat_capacity')))
-        self.a_q_t = self.d_x(factors=(1 / self.x.increment
-                                       * self.material_vector('thermal_conductivity_x')),
-                              variant='backward')
+        """Assemble the factors of the stencils equivalent to the a_* matrices."""
+
+        self._t_q_factors = self._uniform(self.t.increment / self.x.increment
+                                          / (self.material_vector('density')
+                                             * self.material_vector('heat_capacity')))
+        # the factors of the heat flux are negated, so the stencil computes -a_q_t.dot(...)
+        self._q_t_factors = self._uniform(-1 / self.x.increment
+                                          * self.material_vector('thermal_conductivity_x'))
+        self._compile_stencils()
+        self._discard_stencil_matrices()
         self.matrices_assembled = True
 
     def sim_step(self):
@@ -43,17 +88,24 @@ class Thermal1D(fld.Field1D):
         self.temperature.apply_bounds(self.step)
         self.temperature.write_outputs()
 
-        self.heat_flux.values = -self.a_q_t.dot(self.temperature.values)
+        # the heat flux is computed in place in its values
+        self._d_x_backward(self._q_t_factors, self.temperature.values, self.heat_flux.values)
 
         self.heat_flux.apply_bounds(self.step)
         self.heat_flux.write_outputs()
 
-        self.temperature.values -= self.a_t_q.dot(self.heat_flux.values)
+        self.temperature.values -= self._d_x_forward(self._t_q_factors, self.heat_flux.values,
+                                                     self._temperature_change)
 
 
-class Thermal2D(fld.Field2D):
+class Thermal2D(_ThermalField, fld.Field2D):
     """Class for simulation of two-dimensional thermal fields."""
 
+    a_t_qx = fld._StencilMatrix('d_x', '_t_qx_factors')
+    a_t_qy = fld._StencilMatrix('d_y', '_t_qy_factors')
+    a_qx_t = fld._StencilMatrix('d_x', '_qx_t_factors', -1, variant='backward')
+    a_qy_t = fld._StencilMatrix('d_y', '_qy_t_factors', -1, variant='backward')
+
     def __init__(self, *args, **kwargs):
         """Class constructor.
 
@@ -66,27 +118,34 @@ class Thermal2D(fld.Field2D):
         self.heat_flux_x = fld.FieldComponent(self.num_points)
         self.heat_flux_y = fld.FieldComponent(self.num_points)
 
-        # initialize attributes sparse matrices
-        self.a_t_qx = None
-        self.a_t_qy = None
-        self.a_qx_t = None
-        self.a_qy_t = None
+        # initialize attributes for the factors of the stencils and buffers
+        self._t_qx_factors = None
+        self._t_qy_factors = None
+        self._qx_t_factors = None
+        self._qy_t_factors = None
+        self._temperature_change = None
+        self._product = None
+        self._d_x_forward = None
+        self._d_x_backward = None
+        self._d_y_forward = None
+        self._d_y_backward = None
 
     def assemble_matrices(self):
-        """Assemble the a_* matrices required for simulation."""
-
-        self.a_t_qx = self.d_x(factors=(self.t.increment / self.x.increment
-                                        / self.material_vector('density')
-                                        / self.material_vector('heat_capacity')))
-        self.a_t_qy = self.d_y(factors=(self.t.increment / self.y.increment
-                                        / self.material_vector('density')
-                                        / self.material_vector('heat_capacity')))
-        self.a_qx_t = self.d_x(factors=(1 / self.x.increment
-                                        * self.material_vector('thermal_conductivity_x')),
-                               variant='backward')
-        self.a_qy_t = self.d_y(factors=(1 / self.y.increment
-                                        * self.material_vector('thermal_conductivity_y')),
-                               variant='backward')
+        """Assemble the factors of the stencils equivalent to the a_* matrices of both
+        directions."""
+
+        # the material vectors of the volumetric heat capacity are created once for both factors
+        time_factors = self._uniform(self.t.increment / (self.material_vector('density')
+                                                         * self.material_vector('heat_capacity')))
+        self._t_qx_factors = time_factors / self.x.increment
+        self._t_qy_factors = time_factors / self.y.increment
+        # the factors of the heat fluxes are negated, so the stencils compute -a_q*_t.dot(...)
+        self._qx_t_factors = self._uniform(-1 / self.x.increment
+                                           * self.material_vector('thermal_conductivity_x'))
+        self._qy_t_factors = self._uniform(-1 / self.y.increment
+                                           * self.material_vector('thermal_conductivity_y'))
+        self._compile_stencils()
+        self._discard_stencil_matrices()
         self.matrices_assembled = True
 
     def sim_step(self):
@@ -95,22 +154,31 @@ class Thermal2D(fld.Field2D):
         self.temperature.apply_bounds(self.step)
         self.temperature.write_outputs()
 
-        self.heat_flux_x.values = -self.a_qx_t.dot(self.temperature.values)
-        self.heat_flux_y.values = -self.a_qy_t.dot(self.temperature.values)
+        # the heat fluxes are computed in place in their values
+        self._d_x_backward(self._qx_t_factors, self.temperature.values, self.heat_flux_x.values)
+        self._d_y_backward(self._qy_t_factors, self.temperature.values, self.heat_flux_y.values)
 
         self.heat_flux_x.apply_bounds(self.step)
         self.heat_flux_x.write_outputs()
         self.heat_flux_y.apply_bounds(self.step)
         self.heat_flux_y.write_outputs()
 
-        self.temperature.values -= (self.a_t_qx.dot(self.heat_flux_x.values)
-                                    + self.a_t_qy.dot(self.heat_flux_y.values))
+        temperature_change = self._d_x_forward(self._t_qx_factors, self.heat_flux_x.values,
+                                               self._temperature_change)
+        temperature_change += self._d_y_forward(self._t_qy_factors, self.heat_flux_y.values,
+                                                self._product)
+        self.temperature.values -= temperature_change
 
 
-class Thermal3DAxi(fld.Field2D):
+class Thermal3DAxi(_ThermalField, fld.Field2D):
     """Class for simulation of three-dimensional, axial-symmetric thermal fields. Note the x is
     the radial direction, and y is the z direction."""
 
+    a_t_qx = fld._StencilMatrix('d_x', '_t_qx_factors')
+    a_t_qy = fld._StencilMatrix('d_y', '_t_qy_factors')
+    a_qx_t = fld._StencilMatrix('d_x', '_qx_t_factors', -1, variant='backward')
+    a_qy_t = fld._StencilMatrix('d_y', '_qy_t_factors', -1, variant='backward')
+
     def __init__(self, *args, **kwargs):
         """Class constructor.
 
@@ -123,11 +191,18 @@ class Thermal3DAxi(fld.Field2D):
         self.heat_flux_x = fld.FieldComponent(self.num_points)
         self.heat_flux_y = fld.FieldComponent(self.num_points)
 
-        # initialize attributes sparse matrices
-        self.a_t_qx = None
-        self.a_t_qy = None
-        self.a_qx_t = None
-        self.a_qy_t = None
+        # initialize attributes for the factors of the stencils and buffers
+        self._t_qx_factors = None
+        self._t_qy_factors = None
+        self._qx_t_factors = None
+        self._qy_t_factors = None
+        self._temperature_change = None
+        self._product = None
+        self._d_x_forward = None
+        self._d_x_backward = None
+        self._d_y_forward = None
+        self._d_y_backward = None
+        self._row_radii = None
 
     def _radii(self):
         """Returns an array the same size as self.num_points with the distance from the y-axis
@@ -142,20 +217,24 @@ class Thermal3DAxi(fld.Field2D):
         return np.tile(self.x.vector, self.y.samples) + self.x.increment / 2
 
     def assemble_matrices(self):
-        """Assemble the a_* matrices required for simulation."""
-
-        self.a_t_qx = self.d_x(factors=(self.t.increment / self.x.increment
-                                        / self.material_vector('density')
-                                        / self.material_vector('heat_capacity') / self._radii()))
-        self.a_t_qy = self.d_y(factors=(self.t.increment / self.y.increment
-                                        / self.material_vector('density')
-                                        / self.material_vector('heat_capacity')))
-        self.a_qx_t = self.d_x(factors=(1 / self.x.increment
-                                        * self.material_vector('thermal_conductivity_x')),
-                               variant='backward')
-        self.a_qy_t = self.d_y(factors=(1 / self.y.increment
-                                        * self.material_vector('thermal_conductivity_y')),
-                               variant='backward')
+        """Assemble the factors of the stencils equivalent to the a_* matrices, including the
+        radii of the radial heat flux."""
+
+        # the radii are equal for all rows, so the steps only keep the radii of a single row
+        if _outdated(self._row_radii, self.dtype):
+            self._row_radii = (self.x.vector + self.x.increment / 2).astype(self.dtype)
+        # the material vectors of the volumetric heat capacity are created once for both factors
+        time_factors = self.t.increment / (self.material_vector('density')
+                                           * self.material_vector('heat_capacity'))
+        self._t_qx_factors = time_factors / (self.x.increment * self._radii())
+        self._t_qy_factors = self._uniform(time_factors) / self.y.increment
+        # the factors of the heat fluxes are negated, so the stencils compute -a_q*_t.dot(...)
+        self._qx_t_factors = self._uniform(-1 / self.x.increment
+                                           * self.material_vector('thermal_conductivity_x'))
+        self._qy_t_factors = self._uniform(-1 / self.y.increment
+                                           * self.material_vector('thermal_conductivity_y'))
+        self._compile_stencils()
+        self._discard_stencil_matrices()
         self.matrices_assembled = True
 
     def sim_step(self):
@@ -164,16 +243,23 @@ class Thermal3DAxi(fld.Field2D):
         self.temperature.apply_bounds(self.step)
         self.temperature.write_outputs()
 
-        self.heat_flux_x.values = -self.a_qx_t.dot(self.temperature.values)
-        self.heat_flux_y.values = -self.a_qy_t.dot(self.temperature.values)
+        # the heat fluxes are computed in place in their values
+        self._d_x_backward(self._qx_t_factors, self.temperature.values, self.heat_flux_x.values)
+        self._d_y_backward(self._qy_t_factors, self.temperature.values, self.heat_flux_y.values)
 
         self.heat_flux_x.apply_bounds(self.step)
         self.heat_flux_x.write_outputs()
         self.heat_flux_y.apply_bounds(self.step)
         self.heat_flux_y.write_outputs()
 
-        self.temperature.values -= (self.a_t_qx.dot(self.heat_flux_x.values * self._radii())
-                                    + self.a_t_qy.dot(self.heat_flux_y.values))
+        # the product of heat flux and radius is computed row by row in the buffer of the product
+        radial_flux = np.multiply(self.heat_flux_x.values2d, self._row_radii,
+                                  out=self._product.reshape(self.shape)).ravel()
+        temperature_change = self._d_x_forward(self._t_qx_factors, radial_flux,
+                                               self._temperature_change)
+        temperature_change += self._d_y_forward(self._t_qy_factors, self.heat_flux_y.values,
+                                                self._product)
+        self.temperature.values -= temperature_change
 
 
 class ThermalMaterial:
@@ -209,3 +295,17 @@ class ThermalMaterial:
             self.thermal_conductivity_y = value
         else:
             raise ValueError('Thermal conductivity must either be scalar or a 2 element vector.')
+
+
+def _outdated(buffer, dtype):
+    """Checks if a buffer of a field has to be (re)allocated.
+
+    Args:
+        buffer: Buffer or None if not allocated yet.
+        dtype: Data type of the field.
+
+    Returns:
+        True if the buffer is not allocated or has another data type.
+    """
+
+    return buffer is None or buffer.dtype != dtype
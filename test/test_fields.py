@@ -1,4 +1,8 @@
 import numpy as np
+import pickle
+import pytest as pt
+import types
+import pyfds as fds
 import pyfds.fields as fls
 import pyfds.regions as reg
 
@@ -7,6 +11,7 @@ def test_dimension():
     dim = fls.Dimension(3, 0.1)
     assert np.allclose(dim.vector, np.asarray([0, 0.1, 0.2]))
     assert dim.get_index(0.1) == 1
+    assert np.all(dim.get_indices([0.2, 0, 0.1]) == [2, 0, 1])
 
 
 def test_field_component_boundary_1():
@@ -38,6 +43,54 @@ def test_field_component_boundary_3():
     assert np.allclose(fc.values[[5, 6, 7]], [47, 47, 47])
 
 
+def test_field_component_boundary_multiple():
+    fc = fls.FieldComponent(100)
+    fc.values = np.ones(100)
+    fc.add_boundary(reg.LineRegion([5, 6], [0, 0.1]), value=np.arange(3), additive=True)
+    fc.add_boundary(reg.LineRegion([7, 8], [0, 0.1]), value=[np.arange(3), -np.arange(3)])
+    fc.apply_bounds(step=2)
+    assert np.allclose(fc.values[5:9], [3, 3, 2, -2])
+    # overlapping boundaries are applied in order
+    fc.add_boundary(reg.LineRegion([6, 7], [0, 0.1]), value=1, additive=True)
+    fc.apply_bounds(step=1)
+    assert np.allclose(fc.values[5:9], [4, 5, 2, -1])
+
+
+def test_field_component_boundary_scalar_change():
+    fc = fls.FieldComponent(10)
+    fc.add_boundary(reg.LineRegion([2, 3], [0, 0.1]), value=1)
+    fc.add_boundary(reg.LineRegion([5], [0, 0.1]), value=np.arange(3))
+    fc.apply_bounds(step=2)
+    assert np.allclose(fc.values[[2, 3, 5]], [1, 1, 2])
+    # changed scalar values are applied in later steps
+    fc.boundaries[0].value = 3
+    fc.apply_bounds(step=1)
+    assert np.allclose(fc.values[[2, 3, 5]], [3, 3, 1])
+
+
+def test_field_component_boundary_change():
+    fc = fls.FieldComponent(10)
+    fc.add_boundary(reg.LineRegion([2, 3], [0, 0.1]), value=1)
+    fc.apply_bounds(step=0)
+    # replaced indices, additivity and boundary lists are applied in later steps
+    fc.boundaries[0].region.indices = [4, 5]
+    fc.apply_bounds(step=0)
+    assert np.allclose(fc.values[[2, 3, 4, 5]], [1, 1, 1, 1])
+    fc.boundaries[0].additive = True
+    fc.apply_bounds(step=0)
+    assert np.allclose(fc.values[[2, 3, 4, 5]], [1, 1, 2, 2])
+    fc.boundaries = [reg.Boundary(reg.LineRegion([2], [0, 0.1]), value=5)]
+    fc.apply_bounds(step=0)
+    assert np.allclose(fc.values[[2, 3, 4, 5]], [5, 1, 2, 2])
+    # sorted boundaries are applied in their new order
+    fc.add_boundary(reg.LineRegion([2], [0, 0.1]), value=7)
+    fc.apply_bounds(step=0)
+    assert fc.values[2] == 7
+    fc.boundaries.sort(key=lambda bound: bound.value, reverse=True)
+    fc.apply_bounds(step=0)
+    assert fc.values[2] == 5
+
+
 def test_field_component_output():
     fc = fls.FieldComponent(100)
     fc.outputs = [reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'))]
@@ -60,6 +113,8 @@ def test_field1d_d_x():
     assert np.allclose(fld.d_x(variant='backward').toarray(), [[1, 0, 0], [-1, 1, 0], [0, -1, 1]])
     assert np.allclose(fld.d_x(variant='central').toarray(), [[0, 0.5, 0], [-0.5, 0, 0.5],
                                                               [0, -0.5, 0]])
+    # the operators are sparse matrices, so * is the matrix product
+    assert np.allclose(fld.d_x() * np.ones(3), [0, 0, -1])
 
 
 def test_field1d_d_x2():
@@ -67,6 +122,33 @@ def test_field1d_d_x2():
     assert np.allclose(fld.d_x2().toarray(), [[-2, 1, 0], [1, -2, 1], [0, 1, -2]])
 
 
+def test_field1d_compile_stencil():
+    rng = np.random.default_rng(0)
+    values = rng.random(12)
+    factors = rng.random(12)
+    fld = fls.Field1D(12, 1, 1, 1, int(5))
+    out = np.empty(12)
+    for variant in ['forward', 'central', 'backward']:
+        assert np.allclose(fld.compile_stencil(variant)(factors, values, out),
+                           fld.d_x(factors, variant) @ values)
+    assert np.allclose(fld.compile_stencil(order=2)(None, values, out), fld.d_x2() @ values)
+
+
+def test_field2d_compile_stencil():
+    rng = np.random.default_rng(0)
+    values = rng.random(12)
+    factors = rng.random(12)
+    fld = fls.Field2D(3, 1, 4, 1, 1, 1, int(5))
+    out = np.empty(12)
+    for variant in ['forward', 'central', 'backward']:
+        assert np.allclose(fld.compile_stencil(variant)(factors, values, out),
+                           fld.d_x(factors, variant) @ values)
+        assert np.allclose(fld.compile_stencil(variant, direction='y')(factors, values, out),
+                           fld.d_y(factors, variant) @ values)
+    assert np.allclose(fld.compile_stencil(order=2, direction='y')(None, values, out),
+                       fld.d_y2() @ values)
+
+
 def test_field2d_init():
     # create a field where the main material is 5
     fld = fls.Field2D(100, 0.1, 100, 0.1, 100, 0.1, int(5))
@@ -110,6 +192,7 @@ def test_field2d_d_y2():
 def test_field2d_get_index():
     fld = fls.Field2D(4, 0.1, 3, 0.1, 1, 1, int(5))
     assert fld.get_index((0.2, 0.1)) == 6
+    assert np.all(fld.get_index(np.array([[0.2, 0.1], [0, 0], [0.3, 0.2]])) == [6, 0, 11])
 
 
 def test_field1d_get_position():
@@ -126,6 +209,36 @@ def test_field1d_get_line_region():
     fld = fls.Field1D(4, 0.1, 1, 1, int(5))
     fld.material_regions.append(reg.MaterialRegion(fld.get_line_region((0.1, 0.2)), int(23)))
     assert np.allclose(fld.material_vector('real'), [5, 23, 23, 5])
+    assert fld.get_line_region((0.1, 0.2)).indices.dtype == np.intp
+
+
+def test_field_material_vector_cache():
+    fld = fls.Field1D(4, 0.1, 1, 1, int(5))
+    mat_vector = fld.material_vector('real')
+    assert fld.material_vector('real') is mat_vector
+    assert not mat_vector.flags.writeable
+    # changed material regions create a new vector
+    fld.material_regions.append(reg.MaterialRegion(fld.get_line_region((0.1, 0.2)), int(23)))
+    assert np.allclose(fld.material_vector('real'), [5, 23, 23, 5])
+    fld.material_regions[-1].materials = [int(7)]
+    assert np.allclose(fld.material_vector('real'), [5, 7, 7, 5])
+    fld.material_regions[-1].region.indices = [1]
+    assert np.allclose(fld.material_vector('real'), [5, 7, 5, 5])
+    material = types.SimpleNamespace(real=3)
+    fld.material_regions[-1].materials = [material]
+    assert np.allclose(fld.material_vector('real'), [5, 3, 5, 5])
+    material.real = 4
+    assert np.allclose(fld.material_vector('real'), [5, 4, 5, 5])
+    # replaced regions and lists create a new vector, even if their versions are equal
+    fld.material_regions[-1].region = fld.get_line_region((0.2, 0.3))
+    assert np.allclose(fld.material_vector('real'), [5, 5, 4, 4])
+    fld.material_regions = [reg.MaterialRegion(fld.get_line_region((0, 0.1)), int(2))]
+    assert np.allclose(fld.material_vector('real'), [2, 2, 0, 0])
+    # sorted material regions create a new vector, as later regions overwrite earlier ones
+    fld.material_regions.append(reg.MaterialRegion(fld.get_line_region((0.1, 0.2)), int(3)))
+    assert np.allclose(fld.material_vector('real'), [2, 3, 3, 0])
+    fld.material_regions.sort(key=lambda mat_reg: mat_reg.materials[0], reverse=True)
+    assert np.allclose(fld.material_vector('real'), [2, 2, 3, 0])
 
 
 def test_field2d_get_line_region():
@@ -140,9 +253,185 @@ def test_field2d_get_line_region():
     assert np.allclose(region.indices, [9, 7, 4, 2])
 
 
+def test_field2d_get_tri_region():
+    fld = fls.Field2D(4, 1, 4, 1, 1, 1, int(5))
+    region = fld.get_tri_region((0, 0, 3, 0, 0, 3))
+    assert np.allclose(region.indices, [0, 1, 2, 3, 4, 5, 6, 8, 9, 12])
+
+
 def test_field2d_get_rect_region():
     fld = fls.Field2D(3, 1, 4, 0.5, 1, 1, int(5))
     region = fld.get_rect_region((0, 0, 1, 1))
     assert np.allclose(region.indices, [0, 3, 6, 1, 4, 7])
     region = fld.get_rect_region((2, 1.5, -1, -1))
     assert np.allclose(region.indices, [4, 7, 10, 5, 8, 11])
+    region = fld.get_rect_region((0, 0, 1, 1), row_major=True)
+    assert np.allclose(region.indices, [0, 1, 3, 4, 6, 7])
+    fc = fls.FieldComponent(fld.num_points, fld.shape)
+    fc.values = np.arange(fld.num_points, dtype=float)
+    fc.add_output(region)
+    fc.write_outputs()
+    assert np.allclose(fc.outputs[0].signal_array[:, 0], region.indices)
+
+
+def test_field2d_laplacian():
+    fld = fls.Field2D(3, 1, 2, 1, 10, 1, int(5))
+    factors_x = np.arange(1, 7)
+    factors_y = np.arange(7, 13)
+    assert np.allclose(fld.laplacian(factors_x, factors_y).toarray(),
+                       (fld.d_x2(factors_x) + fld.d_y2(factors_y)).toarray())
+    fld = fls.Field2D(1, 1, 3, 1, 10, 1, int(5))
+    assert np.allclose(fld.laplacian().toarray(), (fld.d_x2() + fld.d_y2()).toarray())
+
+
+def test_field2d_gradient():
+    fld = fls.Field2D(3, 1, 2, 1, 10, 1, int(5))
+    factors_x = np.arange(1, 7)
+    factors_y = np.arange(7, 13)
+    assert np.allclose(fld.gradient(factors_x, factors_y, 'central').toarray(),
+                       np.vstack([fld.d_x(factors_x, 'central').toarray(),
+                                  fld.d_y(factors_y, 'central').toarray()]))
+
+
+def test_field_d_op():
+    rng = np.random.default_rng(0)
+    values = rng.random(12)
+    factors = rng.random(12)
+    fld1d = fls.Field1D(12, 1, 1, 1, int(5))
+    fld2d = fls.Field2D(3, 1, 4, 1, 1, 1, int(5))
+    for variant in ['forward', 'central', 'backward']:
+        assert np.allclose(fld1d.d_x_op(factors, variant) @ values,
+                           fld1d.d_x(factors, variant) @ values)
+        assert np.allclose(fld2d.d_x_op(factors, variant) @ values,
+                           fld2d.d_x(factors, variant) @ values)
+        assert np.allclose(fld2d.d_y_op(factors, variant) @ values,
+                           fld2d.d_y(factors, variant) @ values)
+    assert np.allclose(fld2d.d_y_op() @ values, fld2d.d_y() @ values)
+
+
+def test_field_operator_cache():
+    factors = np.random.default_rng(0).random(12)
+    factors.flags.writeable = False
+    fld = fls.Field1D(12, 1, 1, 1, int(5))
+    fld.d_x(factors)
+    fld.d_x(factors)
+    assert len(fld._operators) == 1
+    fld.d_x(factors, variant='central')
+    fld.d_x(2)
+    assert len(fld._operators) == 3
+    # writable factors may change, so they are not cached
+    fld.d_x(2 * factors)
+    assert len(fld._operators) == 3
+
+
+def test_field_operator_cache_eviction(monkeypatch):
+    monkeypatch.setattr(fls.Field, 'max_cached_operators', 2)
+    fld = fls.Field1D(12, 1, 1, 1, int(5))
+    fld.d_x()
+    fld.d_x2()
+    fld.d_x()
+    fld.d_x(variant='central')
+    # the least recently used matrix is dropped
+    assert [key[0] for key in fld._operators] == [(-1, 1), (-0.5, 0.5)]
+
+
+def test_field_operator_copy():
+    fld = fls.Field1D(3, 1, 1, 1, int(5))
+    d_x = fld.d_x()
+    assert d_x.data.flags.c_contiguous
+    # scaling a returned matrix does not change the cached one
+    d_x.data *= 2
+    assert np.allclose(fld.d_x().toarray(), [[-1, 1, 0], [0, -1, 1], [0, 0, -1]])
+
+
+def test_field_pickle():
+    fld = fls.Field1D(12, 1, 1, 1, int(5))
+    d_x = fld.d_x(np.arange(12))
+    fld = pickle.loads(pickle.dumps(fld))
+    assert not fld._operators
+    assert np.allclose(fld.d_x(np.arange(12)).toarray(), d_x.toarray())
+
+
+def test_field_operator_format():
+    fld = fls.Field2D(3, 1, 4, 1, 1, 1, int(5))
+    assert fld.d_y(format='csr').format == 'csr'
+    assert np.allclose(fld.d_y(format='csr').toarray(), fld.d_y().toarray())
+
+
+def test_field_component_values2d():
+    fld = fls.Field2D(3, 1, 2, 1, 1, 1, int(5))
+    fc = fls.FieldComponent(fld.num_points, fld.shape)
+    fc.values2d[1, 0] = 1
+    assert fc.values[3] == 1
+    # components assigned to a field take its shape
+    fld.component = fls.FieldComponent(fld.num_points)
+    assert fld.component.values2d.shape == (2, 3)
+
+
+def test_field_reset_matrices():
+    fld = fls.Field1D(12, 1, 1, 1, int(5))
+    fld.d_x()
+    fld.matrices_assembled = True
+    fld.reset_matrices()
+    assert not fld.matrices_assembled
+    assert not fld._operators
+    fld.matrices_assembled = True
+    fld.add_material_region(fld.get_line_region((2, 4)), int(3))
+    assert not fld.matrices_assembled
+
+
+# simulated fields with the component excited at the given point
+SIMULATED_FIELDS = [
+    (fds.Acoustic1D, dict(t_delta=1e-7, t_samples=10, x_delta=1e-3, x_samples=5,
+                          material=fds.AcousticMaterial(343, 1.2, bulk_viscosity=1e-5)),
+     'pressure', 0),
+    (fds.IdealGas1D, dict(t_delta=1e-7, t_samples=10, x_delta=1e-3, x_samples=5,
+                          material=fds.AcousticMaterial(343, 1.2, isobaric_heat_cap=1005,
+                                                        isochoric_heat_cap=718)),
+     'velocity', 0),
+    (fds.Thermal1D, dict(x_samples=4, x_delta=1, t_samples=10, t_delta=0.1,
+                         material=fds.ThermalMaterial(1, 1, 1)),
+     'temperature', 0),
+    (fds.Thermal2D, dict(x_samples=4, x_delta=1, y_samples=3, y_delta=1, t_samples=10,
+                         t_delta=0.1, material=fds.ThermalMaterial(1, 1, 1)),
+     'temperature', (0, 0)),
+    (fds.Thermal3DAxi, dict(x_samples=4, x_delta=1, y_samples=3, y_delta=1, t_samples=10,
+                            t_delta=0.1, material=fds.ThermalMaterial(1, 1, 1)),
+     'temperature', (0, 0)),
+]
+
+
+@pt.mark.parametrize('field_class, kwargs, component, position', SIMULATED_FIELDS)
+def test_field_dtype(field_class, kwargs, component, position):
+    fields = []
+    for dtype in [np.float64, np.float32]:
+        fld = field_class(**kwargs)
+        fld.dtype = dtype
+        getattr(fld, component).add_boundary(fld.get_point_region(position),
+                                             value=np.ones(fld.t.samples))
+        fld.simulate()
+        fields.append(fld)
+    reference, fld = fields
+    for name, values in vars(fld).items():
+        if isinstance(values, fls.FieldComponent):
+            assert values.values.dtype == np.float32
+            assert np.allclose(values.values, getattr(reference, name).values, rtol=1e-5)
+    for name in dir(fld):
+        if name.startswith('a_') and getattr(fld, name) is not None:
+            assert getattr(fld, name).dtype == np.float32
+
+
+@pt.mark.parametrize('field_class, kwargs, component, position', SIMULATED_FIELDS)
+def test_field_pickle_simulated(field_class, kwargs, component, position):
+    fld = field_class(**kwargs)
+    getattr(fld, component).add_boundary(fld.get_point_region(position),
+                                         value=np.ones(fld.t.samples))
+    fld.simulate(5)
+    copy = pickle.loads(pickle.dumps(fld))
+    # the copy assembles its matrices or compiles its stencils again if they were not pickled,
+    # and continues like the original
+    fld.simulate(5)
+    copy.simulate(5)
+    for name, values in vars(fld).items():
+        if isinstance(values, fls.FieldComponent):
+            assert np.allclose(getattr(copy, name).values, values.values)
@@ -0,0 +1,18 @@
+import numpy as np
+import pyfds as fds
+
+
+def test_ideal_gas1d_matrices():
+    fld = fds.IdealGas1D(t_delta=1e-7, t_samples=10, x_delta=1e-3, x_samples=4,
+                         material=fds.AcousticMaterial(343, 1.2, isobaric_heat_cap=1005,
+                                                       isochoric_heat_cap=718))
+    assert fld.a_v_p is None
+    fld.assemble_matrices()
+    a_v_p = fld.a_v_p
+    assert fld.a_v_p is a_v_p
+    assert np.allclose(a_v_p.toarray(), fld.d_x(factors=1e-4, variant='backward').toarray())
+    assert np.allclose(fld.a_v_v2.toarray(), fld.d_x(factors=5e-5, variant='central').toarray())
+    # reassembled matrices are built from the new factors
+    fld.t.increment = 2e-7
+    fld.assemble_matrices()
+    assert np.allclose(fld.a_v_p.toarray(), 2 * a_v_p.toarray())
@@ -6,3 +6,61 @@ def test_output():
     out = reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'))
     out.signals = [np.linspace(0, 1) for _ in range(len(out.region.indices))]
     assert np.allclose(out.mean_signal, np.linspace(0, 1))
+
+
+def test_output_stream(tmp_path):
+    out = reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'))
+    out.open_stream(tmp_path / 'output.bin', chunk=4)
+    for step in range(10):
+        out.write_stream(step * np.ones(3))
+    out.close_stream()
+    signals = np.fromfile(tmp_path / 'output.bin').reshape(-1, 3)
+    assert np.allclose(signals, np.arange(10)[:, np.newaxis] * np.ones(3))
+
+
+def test_output_record():
+    out = reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'), num_steps=4)
+    for step in range(10):
+        out.record(step * np.ones(3))
+    assert np.allclose(out.signals, np.ones((3, 1)) * np.arange(10))
+
+
+def test_output_reserve():
+    out = reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'))
+    out.block_size = 2
+    out.record(np.zeros(3))
+    out.reserve(5)
+    signal_array = out.signal_array
+    for step in range(1, 6):
+        out.record(step * np.ones(3))
+    # the reserved steps are recorded in the same array
+    assert np.shares_memory(out.signal_array, signal_array)
+    assert np.allclose(out.signal_array, np.ones((3, 1)) * np.arange(6))
+    # steps beyond the reserved ones grow the array geometrically
+    out.record(6 * np.ones(3))
+    assert out._signal_buffer.shape == (12, 3)
+
+
+def test_output_mean_signal():
+    out = reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'), num_steps=4)
+    for step in range(10):
+        out.record(step * np.arange(3))
+        assert np.allclose(out.mean_signal, np.arange(step + 1))
+    # the array of the signals cannot be modified, which would invalidate the kept means
+    assert not out.signal_array.flags.writeable
+
+
+def test_output_signals_list():
+    out = reg.Output(reg.LineRegion([0, 1, 2], [0, 0.2], 'test output'))
+    for step in range(2):
+        out.record(step * np.ones(3))
+    assert np.allclose(out.signal_array, [[0, 1]] * 3)
+    signals = out.signals
+    assert signals == [[0, 1]] * 3
+    # the list is kept and later steps are appended, but they are still recorded in the array
+    signals[0][1] = 4
+    out.record(2 * np.ones(3))
+    assert out.signals is signals
+    assert out.signals[0] == [0, 4, 2]
+    assert np.allclose(out.mean_signal, [0, 1, 2])
+    assert np.allclose(out.signal_array, [[0, 1, 2]] * 3)
@@ -0,0 +1,33 @@
+import numpy as np
+import pickle
+import pyfds as fds
+
+
+def test_thermal1d_matrix_cache():
+    fld = fds.Thermal1D(x_samples=3, x_delta=1, t_samples=10, t_delta=1,
+                        material=fds.ThermalMaterial(1, 1, 1))
+    assert fld.a_t_q is None
+    fld.assemble_matrices()
+    a_t_q = fld.a_t_q
+    assert fld.a_t_q is a_t_q
+    assert np.allclose(a_t_q.toarray(), [[-1, 1, 0], [0, -1, 1], [0, 0, -1]])
+    # reassembled matrices are built from the new factors
+    fld.material_regions[0].materials = [fds.ThermalMaterial(1, 2, 1)]
+    fld.assemble_matrices()
+    assert fld.a_t_q is not a_t_q
+    assert np.allclose(fld.a_t_q.toarray(), np.array([[-1, 1, 0], [0, -1, 1], [0, 0, -1]]) / 2)
+
+
+def test_thermal2d_pickle():
+    fields = []
+    for _ in range(2):
+        fld = fds.Thermal2D(x_samples=4, x_delta=1, y_samples=3, y_delta=1, t_samples=10,
+                            t_delta=0.1, material=fds.ThermalMaterial(1, 1, 1))
+        fld.temperature.add_boundary(fld.get_point_region((0, 0)), value=np.ones(10))
+        fld.simulate(5)
+        fields.append(fld)
+    # the stencils of a simulated field are compiled again after it has been unpickled
+    fields[1] = pickle.loads(pickle.dumps(fields[1]))
+    for fld in fields:
+        fld.simulate(5)
+    assert np.allclose(fields[1].temperature.values, fields[0].temperature.values)